@@ -7,7 +7,7 @@
 
 # 1 attack
 import time
-from pycomm.ab_comm.clx import Driver as ClxDriver
+from scripts.PLC.emulator import Driver as ClxDriver
 
 PLC_IPS = {
     'plc1': '192.168.1.151',
@@ -7,7 +7,7 @@
 
 # 3 attack
 import time
-from pycomm.ab_comm.clx import Driver as ClxDriver
+from scripts.PLC.emulator import Driver as ClxDriver
 
 PLC_IPS = {
     'plc1': '192.168.1.151',
@@ -26,16 +26,22 @@ def read_plc_tag(plc, tag_name):
         print("Error reading tag:", e)
         return None
 
+def read_plc_tags(plc, tag_names):
+    try:
+        return [value for _, value, _ in plc.read_tag(tag_names)]
+    except Exception as e:
+        print("Error reading tags:", e)
+        return [None] * len(tag_names)
+
 def detect_anomaly(plc_ip):
     plc = ClxDriver()
     if plc.open(plc_ip):
         last_target_level = None
         while True:
             try:
-                current_level = read_plc_tag(plc, CURRENT_LEVEL_TAG)
-                moving = read_plc_tag(plc, MOVING_TAG)
-                moving_to_level1 = read_plc_tag(plc, MOVING_TO_LEVEL1_TAG)
-                moving_to_level2 = read_plc_tag(plc, MOVING_TO_LEVEL2_TAG)
+                # One multi-tag request instead of a round trip per tag
+                current_level, moving, moving_to_level1, moving_to_level2 = read_plc_tags(
+                    plc, [CURRENT_LEVEL_TAG, MOVING_TAG, MOVING_TO_LEVEL1_TAG, MOVING_TO_LEVEL2_TAG])
 
                 if moving_to_level1:
                     target_level = 1
@@ -0,0 +1,212 @@
+"""
+Stand-in for the elevator PLC, served from a running `Elevator` state machine
+instead of hardware. `ElevatorPLC` has the `open`/`read_tag`/`write_tag`/`close`
+surface of pycomm's `ClxDriver`, `serve` exposes emulated PLCs on a localhost
+port and `Client` talks to them. The scripts pick a driver through `Driver()`:
+
+    PLC_EMULATOR=local           in-process emulator, one elevator per PLC ip
+    PLC_EMULATOR=127.0.0.1:44818 emulators served by `python -m scripts.PLC.emulator`
+    unset                        the real `ClxDriver`
+
+The simulator is only imported once an emulated PLC is opened, so driving
+real hardware needs nothing beyond pycomm.
+"""
+import argparse
+import json
+import os
+import socket
+import socketserver
+import threading
+import zlib
+
+from time import perf_counter as timer
+
+
+ADDRESS = os.getenv('PLC_EMULATOR')
+PORT = 44818            # EtherNet/IP
+RATE = float(os.getenv('PLC_RATE', 1)) or None     # Scan cycles per second, 0 for one cycle per read
+
+TYPES = {
+    'ThresTemp': 'REAL',
+    'weight': 'REAL',
+    'MAX_TEMP': 'INT',
+    'MAX_WEIGHT': 'INT',
+    'currentLevel': 'INT',
+}
+SENSED = {'ThresTemp': 'temp', 'weight': 'weight'}     # Tags read through the noisy sensors, by trace column
+
+
+class ElevatorPLC:
+    """
+    Emulated PLC whose tags are the fields of an `ElevatorState`. The state is
+    stepped `rate` cycles per wall clock second, caught up lazily on every
+    access, or one cycle per read when `rate` is None so polling runs as fast
+    as it can. Sensor tags read back the last noisy sensor value, every other
+    tag the PLC's own state. Writes land in the state like they would in PLC
+    memory, so the next scan acts on them: that is how attacks get in.
+    `seed` defaults to `Config.SEED`.
+    """
+    def __init__(self, seed=None, rate=RATE, state=None, plan=None):
+        self.seed, self.rate = seed, rate
+        self.state, self.plan = state, plan
+        self.lock = threading.Lock()
+        self.cycles = None
+
+    def open(self, ip_address):
+        """ Power up the elevator of the PLC at `ip_address`, each address gets its own run of `seed` """
+        from simulation.elevator.runtime import Config
+        from simulation.elevator.simulator import Elevator, ElevatorState
+
+        sim = Elevator(Config.SEED if self.seed is None else self.seed, zlib.crc32(ip_address.encode()))
+        self.state = self.state or ElevatorState(**sim.source.initial())
+        self.cycles = sim.stream(self.state, self.plan, chunk=1)
+        self.trace, self.cycle, self.began = next(self.cycles), 1, timer()
+        return True
+
+    def step(self):
+        """ Run the scans due by now """
+        due = self.cycle + 1 if self.rate is None else int((timer() - self.began) * self.rate) + 1
+        while self.cycle < due:
+            self.trace = next(self.cycles)
+            self.cycle += 1
+
+    def value(self, tag):
+        if tag in SENSED:
+            return self.trace[SENSED[tag]][0].item()
+        if not hasattr(self.state, tag):
+            raise KeyError(f"Unknown tag {tag}")
+        return getattr(self.state, tag)
+
+    def read_tag(self, tag):
+        """ `(value, type)` of `tag`, or `[(tag, value, type), ...]` for a list of tags, like `ClxDriver` """
+        with self.lock:
+            self.step()
+            if isinstance(tag, (list, tuple)):
+                return [(name, self.value(name), TYPES.get(name, 'BOOL')) for name in tag]
+            return self.value(tag), TYPES.get(tag, 'BOOL')
+
+    def write_tag(self, tag, value=None, typ=None):
+        """ Set `tag` in PLC memory, or every `(tag, value, type)` of a list """
+        writes = tag if isinstance(tag, (list, tuple)) else [(tag, value, typ)]
+        with self.lock:
+            self.step()
+            for name, value, _ in writes:
+                if not hasattr(self.state, name):
+                    raise KeyError(f"Unknown tag {name}")
+                setattr(self.state, name, value)
+        return True
+
+    def close(self):
+        self.cycles = None
+
+
+class Handler(socketserver.StreamRequestHandler):
+    """ One connection, one JSON request per line: `open`, `read`, `write` or `close` """
+    def handle(self):
+        plc = None
+        for line in self.rfile:
+            request = json.loads(line)
+            try:
+                if request['op'] == 'open':
+                    plc = self.server.plc(request['ip'])
+                    reply = True
+                elif request['op'] == 'read':
+                    reply = plc.read_tag(request['tag'])
+                elif request['op'] == 'write':
+                    reply = plc.write_tag(request['tag'], request.get('value'), request.get('type'))
+                else:
+                    break
+                self.wfile.write(json.dumps({'ok': reply}).encode() + b"\n")
+            except Exception as e:
+                self.wfile.write(json.dumps({'error': e.args[0] if e.args else str(e)}).encode() + b"\n")
+
+
+class Server(socketserver.ThreadingTCPServer):
+    """ Emulated PLCs on one port, created on the first `open` of their ip and shared by every client """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, seed=None, rate=RATE):
+        super().__init__(address, Handler)
+        self.seed, self.rate = seed, rate
+        self.plcs = {}
+        self.lock = threading.Lock()
+
+    def plc(self, ip):
+        with self.lock:
+            if ip not in self.plcs:
+                self.plcs[ip] = ElevatorPLC(self.seed, self.rate)
+                self.plcs[ip].open(ip)
+            return self.plcs[ip]
+
+
+def serve(host='127.0.0.1', port=PORT, seed=None, rate=RATE, background=False):
+    """ Serve emulated PLCs on `host:port`, from a daemon thread with `background` set """
+    server = Server((host, port), seed, rate)
+    if background:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    else:
+        server.serve_forever()
+    return server
+
+
+class Client:
+    """ `ClxDriver` surface over a connection to a `serve`d emulator """
+    def __init__(self, host='127.0.0.1', port=PORT):
+        self.address = host, port
+        self.sock = None
+
+    def call(self, **request):
+        self.wfile.write(json.dumps(request).encode() + b"\n")
+        self.wfile.flush()
+        line = self.rfile.readline()
+        if not line:
+            raise ConnectionError(f"Emulator at {self.address[0]}:{self.address[1]} went away")
+        reply = json.loads(line)
+        if 'error' in reply:
+            raise KeyError(reply['error'])
+        return reply['ok']
+
+    def open(self, ip_address):
+        self.sock = socket.create_connection(self.address)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.rfile, self.wfile = self.sock.makefile('rb'), self.sock.makefile('wb')
+        return self.call(op='open', ip=ip_address)
+
+    def read_tag(self, tag):
+        reply = self.call(op='read', tag=tag)
+        return [tuple(item) for item in reply] if isinstance(tag, (list, tuple)) else tuple(reply)
+
+    def write_tag(self, tag, value=None, typ=None):
+        return self.call(op='write', tag=tag, value=value, type=typ)
+
+    def close(self):
+        if self.sock:
+            self.rfile.close()
+            self.wfile.close()
+            self.sock.close()
+            self.sock = None
+
+
+def Driver():
+    """ PLC driver picked by `PLC_EMULATOR`, the real `ClxDriver` when unset """
+    if ADDRESS == 'local':
+        return ElevatorPLC()
+    if ADDRESS:
+        host, _, port = ADDRESS.rpartition(':')
+        return Client(host or '127.0.0.1', int(port or PORT))
+
+    from pycomm.ab_comm.clx import Driver as ClxDriver
+    return ClxDriver()
+
+
+if __name__ == "__main__":
+    A = argparse.ArgumentParser()
+    A.add_argument("--host", default="127.0.0.1")
+    A.add_argument("--port", type=int, default=PORT)
+    A.add_argument("--seed", help="master seed, SIM_SEED by default", type=int)
+    A.add_argument("--rate", help="scan cycles per second, 0 for one cycle per read", type=float, default=RATE)
+    args = A.parse_args()
+
+    print(f"Emulating elevator PLCs on {args.host}:{args.port}")
+    serve(args.host, args.port, args.seed, args.rate or None)
@@ -0,0 +1,131 @@
+"""
+Concurrent tag polling across every PLC of a `PLC_IPS` map. Each PLC keeps
+one open connection, served by its own worker thread since the drivers block,
+and is read with a single multi-tag request per cycle on a fixed-rate
+schedule. Samples go to an `asyncio.Queue` for downstream detectors.
+"""
+import argparse
+import asyncio
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+from scripts.PLC.emulator import Driver
+
+
+PLC_IPS = {
+    'plc1': '192.168.1.151',
+}
+TAGS = ['ThresTemp', 'moving', 'currentLevel', 'movingToLevel1', 'movingToLevel2', 'ButtonLevel1']
+BACKOFF, MAX_BACKOFF = 0.5, 30      # seconds, doubled after every failed open or lost connection
+
+
+class Sample(NamedTuple):
+    plc: str
+    time: float         # epoch seconds, taken when the read returned
+    values: dict        # tag -> value
+
+
+class Poller:
+    """
+    Poll `tags` from every PLC of `plcs` every `interval` seconds, each PLC
+    on its own schedule so a slow or dead one never holds up the others.
+    Lost connections are reopened with exponential backoff. When `queue` is
+    full the oldest sample is dropped rather than falling behind schedule.
+    """
+    def __init__(self, plcs=PLC_IPS, tags=TAGS, interval=1.0, queue=None, driver=Driver):
+        self.plcs, self.tags, self.interval = plcs, list(tags), interval
+        self.queue = queue if queue is not None else asyncio.Queue(maxsize=10000)
+        self.driver = driver
+        self.reads = dict.fromkeys(plcs, 0)
+        self.dropped = 0
+        self.pool = None
+
+    def call(self, fn, *args):
+        return asyncio.get_running_loop().run_in_executor(self.pool, fn, *args)
+
+    async def connect(self, name):
+        """ Open PLC `name`, None when it does not answer """
+        plc = self.driver()
+        try:
+            if await self.call(plc.open, self.plcs[name]):
+                return plc
+        except Exception as e:
+            print(f"Unable to open {name} <{self.plcs[name]}>: {e}")
+        return None
+
+    def publish(self, sample):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(sample)
+
+    async def poll(self, name):
+        """
+        Read PLC `name` on schedule forever. Every failed open or lost
+        connection waits out a delay doubled each time, and only a successful
+        read resets it, so a PLC that accepts connections but fails its reads
+        is retried no faster than one that does not answer at all.
+        """
+        loop = asyncio.get_running_loop()
+        delay = BACKOFF
+        while True:
+            plc = await self.connect(name)
+            if plc is not None:
+                deadline = loop.time()
+                try:
+                    while True:
+                        rs = await self.call(plc.read_tag, self.tags)
+                        if not rs:
+                            raise ConnectionError(f"No reply from {name} <{self.plcs[name]}>")
+                        self.publish(Sample(name, time.time(), {tag: value for tag, value, _ in rs}))
+                        self.reads[name] += 1
+                        delay = BACKOFF
+
+                        deadline += self.interval
+                        if deadline < loop.time():       # Missed ticks are skipped, not bunched up
+                            deadline = loop.time()
+                        await asyncio.sleep(deadline - loop.time())
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    print(f"Lost {name} <{self.plcs[name]}>: {e}")
+                finally:
+                    await asyncio.shield(self.call(plc.close))
+
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_BACKOFF)
+
+    async def run(self, duration=None):
+        """ Poll every PLC until cancelled, or for `duration` seconds """
+        with ThreadPoolExecutor(max_workers=len(self.plcs), thread_name_prefix="plc") as self.pool:
+            tasks = [asyncio.create_task(self.poll(name)) for name in self.plcs]
+            try:
+                await asyncio.wait_for(asyncio.gather(*tasks), duration)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+
+if __name__ == "__main__":
+    A = argparse.ArgumentParser()
+    A.add_argument("-n", "--plcs", help="poll this many PLCs, numbered from the first address", type=int, default=1)
+    A.add_argument("-t", "--tags", help="comma separated tags", default=",".join(TAGS))
+    A.add_argument("-i", "--interval", help="seconds between reads of a PLC", type=float, default=1.0)
+    A.add_argument("--duration", help="seconds to poll for", type=float, default=10)
+    args = A.parse_args()
+
+    base, _, last = PLC_IPS['plc1'].rpartition('.')
+    plcs = {f"plc{n + 1}": f"{base}.{int(last) + n}" for n in range(args.plcs)}
+    poller = Poller(plcs, args.tags.split(','), args.interval)
+    began = time.perf_counter()
+    asyncio.run(poller.run(args.duration))
+    elapsed = time.perf_counter() - began
+
+    reads = sum(poller.reads.values())
+    print(f"{reads} reads of {len(poller.tags)} tags from {len(plcs)} PLC(s) in {elapsed:.2f}s: "
+          f"{reads / elapsed:.1f} reads/s, {poller.dropped} samples dropped")
@@ -0,0 +1,127 @@
+"""
+Binary log of polled PLC samples. Records are fixed width: epoch time, PLC
+index and one typed column per tag, written straight into preallocated,
+memory-mapped `.npy` segments that rotate once full. Nothing is formatted
+and nothing is written per sample; the OS pages the segments out and
+`flush` forces them to disk. Unfilled rows have a zero time, which is how
+a reader finds the end of a segment that was never closed.
+"""
+import json
+import os
+import numpy as np
+
+from scripts.PLC.emulator import TYPES
+
+
+DTYPES = {'REAL': np.float32, 'INT': np.int32, 'DINT': np.int32, 'BOOL': np.int8}
+MISSING = {'REAL': np.nan, 'INT': -1, 'DINT': -1, 'BOOL': -1}     # Stored for failed reads
+SEGMENT_BYTES = 64 << 20
+FLUSH_EVERY = 4096      # records
+
+
+class SampleLog:
+    """
+    Segmented sample log under `root`. A segment holds as many records as
+    fit in `segment_bytes`; with `keep` set only that many segments are kept
+    and the oldest is deleted on rotation, making the log a ring. Reopening
+    a root resumes after its last segment, and raises `ValueError` when the
+    log there records other PLCs or tags.
+    """
+    def __init__(self, root, plcs, tags, types=TYPES, segment_bytes=SEGMENT_BYTES, keep=None):
+        os.makedirs(root, exist_ok=True)
+        self.root, self.keep = root, keep
+        self.plcs = {name: idx for idx, name in enumerate(plcs)}
+        self.tags = list(tags)
+        kinds = [types.get(tag, 'BOOL') for tag in self.tags]
+        self.dtype = np.dtype([('time', np.float64), ('plc', np.uint16)] +
+                              [(tag, DTYPES[kind]) for tag, kind in zip(self.tags, kinds)])
+        self.missing = [MISSING[kind] for kind in kinds]
+        self.capacity = max(1, segment_bytes // self.dtype.itemsize)
+        meta = json.loads(json.dumps({'plcs': list(self.plcs), 'tags': self.tags, 'types': kinds,
+                                      'dtype': self.dtype.descr}))
+        existing = segments(root)
+        if existing:
+            with open(os.path.join(root, "meta.json")) as fp:
+                logged = json.load(fp)
+            if {key: logged.get(key) for key in meta} != meta:
+                raise ValueError(f"{root} holds a log of {logged.get('plcs')} {logged.get('tags')}, "
+                                 f"not {meta['plcs']} {meta['tags']}")
+        with open(os.path.join(root, "meta.json"), 'w') as fp:
+            json.dump({**meta, 'capacity': self.capacity}, fp)
+
+        self.segment, self.rows, self.cursor, self.pending = existing[-1] if existing else -1, None, 0, 0
+        self.rotate()
+
+    def rotate(self):
+        """ Close the current segment and preallocate the next one """
+        if self.rows is not None:
+            self.flush()
+            del self.rows
+        self.segment += 1
+        self.rows = np.lib.format.open_memmap(segment(self.root, self.segment), mode='w+', dtype=self.dtype,
+                                              shape=(self.capacity,))
+        self.cursor = 0
+        if self.keep:
+            for idx in segments(self.root)[:-self.keep]:
+                os.remove(segment(self.root, idx))
+
+    def append(self, sample):
+        """ Store one `Sample` of the poller """
+        if self.cursor == self.capacity:
+            self.rotate()
+        values = sample.values
+        self.rows[self.cursor] = (sample.time, self.plcs[sample.plc],
+                                  *(missing if values.get(tag) is None else values[tag]
+                                    for tag, missing in zip(self.tags, self.missing)))
+        self.cursor += 1
+        self.pending += 1
+        if self.pending >= FLUSH_EVERY:
+            self.flush()
+
+    def extend(self, samples):
+        for sample in samples:
+            self.append(sample)
+
+    def flush(self):
+        self.rows.flush()
+        self.pending = 0
+
+    def close(self):
+        if self.rows is not None:
+            self.flush()
+            self.rows = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def segment(root, idx):
+    return os.path.join(root, f"{idx:06d}.npy")
+
+
+def segments(root):
+    """ Sorted indices of the segments still on disk """
+    return sorted(int(name[:-4]) for name in os.listdir(root) if name.endswith(".npy") and name[:-4].isdigit())
+
+
+def read(root, plc=None):
+    """
+    Every record logged under `root` as one structured array, oldest first,
+    optionally only those of PLC `plc`. Segments are memory-mapped and cut
+    at their first unfilled row, so only the filled part is ever copied.
+    """
+    with open(os.path.join(root, "meta.json")) as fp:
+        meta = json.load(fp)
+
+    parts = []
+    for idx in segments(root):
+        rows = np.load(segment(root, idx), mmap_mode='r')
+        filled = np.searchsorted(rows['time'] == 0, True)
+        parts.append(rows[:filled])
+    rs = np.concatenate(parts) if parts else np.zeros(0, np.dtype([tuple(field) for field in meta['dtype']]))
+    if plc is not None:
+        rs = rs[rs['plc'] == meta['plcs'].index(plc)]
+    return rs
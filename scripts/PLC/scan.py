@@ -1,43 +1,37 @@
-
+import asyncio
 import os
-import csv
-import time
 
-from datetime import datetime
-from pycomm.ab_comm.clx import Driver as ClxDriver
+from scripts.PLC.poller import Poller
+from scripts.PLC.samplelog import SampleLog
 
 
 class TemperatureScanner:
     TEMP_TAG = 'ThresTemp'
-    IP_ADDR = '192.168.1.151'
+    PLC_IPS = {'plc1': '192.168.1.151'}
     INTERVAL = 1    # seconds
 
     def __init__(self) -> None:
         cwd = os.path.dirname(__file__)
         runs = os.path.join(cwd, "./artifacts/runs")
-        nextRun = os.path.join(
-            runs, f"./{max([int(r) for r in os.walk(runs)[1]]) + 1}")
-        os.makedirs(nextRun, exist_ok=True)
-        self.outfile = os.path.join(nextRun, "./temp.csv")
-        open(self.outfile, 'w')
-
-    def scan(self):
-        self.plc = ClxDriver()
-        if self.plc.open(self.IP_ADDR):
-            print("Monitoring temperature sensor ...")
-            with open(self.outfile, 'a', newline='\n') as csvfile:
-                tv = csv.writer(csvfile, delimiter=' ', quotechar='|', quoting=csv.QUOTE_MINIMAL)
-                for _ in range(1000):
-                    temp = self.plc.read_tag(self.TEMP_TAG)
-                    if temp:
-                        now = [datetime.now().ctime(), temp[0]]
-                        print("\t", now)
-                        tv.writerow(now)
-                    time.sleep(self.INTERVAL)
-        raise ConnectionError("Unable to connect to PLC: <%s>" % self.IP_ADDR)
-
-    def __del__(self):
-        self.plc.close()
+        os.makedirs(runs, exist_ok=True)
+        nextRun = max((int(name) for name in os.listdir(runs) if name.isdigit()), default=0) + 1
+        self.outdir = os.path.join(runs, str(nextRun), "temp")
+
+    def scan(self, samples=1000):
+        print(f"Monitoring temperature sensor into {self.outdir} ...")
+        asyncio.run(self.record(samples))
+
+    async def record(self, samples):
+        """ Log the first `samples` readings of every PLC as they come off the poller """
+        poller = Poller(self.PLC_IPS, [self.TEMP_TAG], self.INTERVAL)
+        polling = asyncio.create_task(poller.run())
+        try:
+            with SampleLog(self.outdir, self.PLC_IPS, [self.TEMP_TAG]) as log:
+                for _ in range(samples * len(self.PLC_IPS)):
+                    log.append(await poller.queue.get())
+        finally:
+            polling.cancel()
+            await asyncio.gather(polling, return_exceptions=True)
 
 
 if __name__ == '__main__':
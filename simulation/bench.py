@@ -0,0 +1,193 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+from time import perf_counter as timer
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+from simulation import detect, plots, scoring
+from simulation.elevator import utils
+from simulation.elevator.runtime import Config
+from simulation.elevator.batch import BatchElevator, BatchState
+from simulation.elevator.simulator import Elevator, ElevatorState
+from simulation.elevator.store import TraceStore
+from simulation.log import ChangeWriter
+
+
+SEED = 20240814
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+BENCH = os.path.join(ROOT, "benchmarks")
+HEAVY = ('pandas', 'matplotlib')
+STARTUP_BUDGET = 0.5    # Seconds allowed for `python -m simulation.cli --help`
+
+
+def measure(fn, repeat):
+    """ Best wall time of `repeat` calls, setup excluded """
+    best = float('inf')
+    for _ in range(repeat):
+        begin = timer()
+        fn()
+        best = min(best, timer() - begin)
+    return best
+
+
+def startup(repeat):
+    """ Wall time of `python -m simulation.cli --help` in a fresh interpreter """
+    env = {**os.environ, 'PYTHONPATH': ROOT}
+    command = [sys.executable, '-m', 'simulation.cli', '--help']
+    return measure(lambda: subprocess.run(command, env=env, cwd=ROOT, stdout=subprocess.DEVNULL, check=True), repeat)
+
+
+def heavy():
+    """ `HEAVY` modules loaded by merely importing the sweep entry point, should be none """
+    env = {**os.environ, 'PYTHONPATH': ROOT}
+    loaded = subprocess.run([sys.executable, '-c', 'import sys, simulation.cli; print(*sys.modules)'],
+                            env=env, cwd=ROOT, capture_output=True, text=True, check=True).stdout.split()
+    return sorted({name.split('.')[0] for name in loaded} & set(HEAVY))
+
+
+def cases(runs, rounds, root):
+    """
+    Benchmark name -> zero-argument callable, all on pinned seeds, traces
+    stored under `root`. Every case covers all `runs` runs, the scalar ones
+    by looping over them, so both engines are timed on the same work.
+    """
+    category = "ATTACK_MAX_TEMP,SURGE"
+    traces = BatchElevator(SEED).simulate(BatchState.create(runs, 900, 60), rounds, category, rounds // 4, rounds // 2)
+    series = [(t['standard_temp'].tolist(), t['temp'].tolist(), t.readings, t.attack_points.tolist()) for t in traces]
+    params = [{'drift': drift, 'threshold': threshold} for drift in [0.3, 0.5, 0.7, 0.9] for threshold in [4, 6, 8]]
+    alarms = [detect.change_points(t, 'temp', True, params) for t in traces]
+    store = TraceStore(os.path.join(root, f"{runs}x{rounds}"))
+    store.write(0, traces, alarms)
+    entries = [(lane, spikes, {'cycle': lane, 'trace': lane, 'entry': entry, 'detector': 'cusum', **param})
+               for lane, found in enumerate(alarms) for entry, (param, spikes) in enumerate(zip(params, found))]
+    summary = scoring.records(traces, entries)
+    writer = ChangeWriter([dict(row) for row in summary])
+    frame = writer.changes.iloc[0]
+
+    def simulate():
+        for run in range(runs):
+            Elevator(SEED, run).simulate(ElevatorState(weight=900, ThresTemp=60), rounds, category, 0, rounds)
+
+    def update():
+        for run in range(runs):
+            sim, state = Elevator(SEED, run), ElevatorState(weight=900, ThresTemp=60)
+            noise = sim.get_noisy_elevator_state(state, np.zeros(6))
+            for _ in range(rounds):
+                state.ButtonLevel1 = 1
+                sim.update(state, noise)
+
+    def draw():
+        plots.draw(frame, store=store)
+        plt.close('all')
+
+    return {
+        'Elevator.simulate': simulate,
+        'BatchElevator.simulate': lambda: BatchElevator(SEED).simulate(BatchState.create(runs, 900, 60), rounds, category, 0, rounds),
+        'Elevator.update': update,
+        'detect.cusum': lambda: [detect.cusum(standard, observed, readings, True, params[0], {'category': category, 'attacks': points})
+                                 for standard, observed, readings, points in series],
+        'detect.change_points': lambda: [detect.change_points(t, 'temp', True, params) for t in traces],
+        'detect.analyze': lambda: [detect.analyze({'category': category, 'samples': rounds, 'attacks': len(points),
+                                                   'attack_points': list(points), 'change_points': []},
+                                                  {'hits': 1, 'misses': 0}) for *_, points in series],
+        'utils.group': lambda: [utils.group(points) for *_, points in series],
+        'utils.merge': lambda: [utils.merge([(p, p + 3) for p in points]) for *_, points in series],
+        'scoring.records': lambda: scoring.records(traces, entries),
+        'TraceStore.write': lambda: TraceStore(os.path.join(root, "write")).write(0, traces, alarms),
+        'TraceStore.load': lambda: [store.load(tid)['temp'].sum() for tid in store],
+        'TraceStore.alarms': lambda: [store.alarms(tid, entry).sum() for tid in store for entry in range(len(params))],
+        'ChangeWriter.process': lambda: writer.process([dict(row) for row in summary]),
+        'plots.draw': draw,
+    }
+
+
+def bench(scales, repeat, only=None):
+    Config.SHOW_PLOTS, Config.SAVE_PLOTS = False, False
+    results = {}
+    if not only or 'startup' in only:
+        results['startup'] = startup(repeat)
+        print(f"{'cli --help':>24} {'':>17}  {results['startup'] * 1e3:10.3f} ms")
+
+    with tempfile.TemporaryDirectory(prefix="bench-") as root:
+        for runs, rounds in scales:
+            for name, fn in cases(runs, rounds, root).items():
+                if only and name not in only:
+                    continue
+                results[f"{name}[{runs}x{rounds}]"] = measure(fn, repeat)
+                print(f"{name:>24} [{runs:>5} x {rounds:>6}]  {results[f'{name}[{runs}x{rounds}]'] * 1e3:10.3f} ms")
+
+    return {
+        'meta': {
+            'seed': SEED,
+            'repeat': repeat,
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+        },
+        'results': results,
+    }
+
+
+def compare(current, baseline, tolerance, floor=5e-4):
+    """
+    Benchmarks slower than the baseline by more than `tolerance`, as `name -> ratio`.
+    Slowdowns under `floor` seconds are timer noise and never count.
+    """
+    regressions = {}
+    for name, seconds in current['results'].items():
+        before = baseline['results'].get(name)
+        if before:
+            ratio = seconds / before
+            print(f"{name:>40}  {before * 1e3:10.3f} -> {seconds * 1e3:10.3f} ms  ({ratio:5.2f}x)")
+            if ratio > 1 + tolerance and seconds - before > floor:
+                regressions[name] = ratio
+    return regressions
+
+
+if __name__ == "__main__":
+    A = argparse.ArgumentParser()
+    A.add_argument("--scales", help="comma separated RUNSxROUNDS", default="10x500,100x500,100x5000")
+    A.add_argument("--repeat", help="best of this many timings", type=int, default=3)
+    A.add_argument("--only", help="comma separated benchmark names, eg: startup,detect.cusum")
+    A.add_argument("--out", help="where to write the results", default=os.path.join(BENCH, "results.json"))
+    A.add_argument("--baseline", help="stored baseline to compare against", default=os.path.join(BENCH, "baseline.json"))
+    A.add_argument("--save-baseline", help="store these results as the new baseline", action="store_true")
+    A.add_argument("--tolerance", help="allowed slowdown before failing, 0.2 = 20%%", type=float, default=0.2)
+    A.add_argument("--budget", help="seconds allowed for cli --help", type=float, default=STARTUP_BUDGET)
+    args = A.parse_args()
+
+    scales = [tuple(int(n) for n in scale.split('x')) for scale in args.scales.split(',')]
+    current = bench(scales, args.repeat, args.only.split(',') if args.only else None)
+
+    os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    with open(args.save_baseline and args.baseline or args.out, 'w') as fp:
+        json.dump(current, fp, indent=2)
+
+    failures = []
+    if current['results'].get('startup', 0) > args.budget:
+        failures.append(f"cli --help took {current['results']['startup']:.3f}s, budget {args.budget:.3f}s")
+    loaded = heavy()
+    if loaded:
+        failures.append(f"importing simulation.cli loads {', '.join(loaded)}")
+
+    if not args.save_baseline and not os.path.exists(args.baseline):
+        failures.append(f"no baseline at {args.baseline}, store one with --save-baseline")
+    elif not args.save_baseline:
+        with open(args.baseline) as fp:
+            regressions = compare(current, json.load(fp), args.tolerance)
+        if regressions:
+            failures.append(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+
+    if failures:
+        print("\n" + "\n".join(failures))
+        sys.exit(1)
@@ -1,59 +1,163 @@
 
 import argparse
+import contextlib
+import functools
 import itertools
-import random
+import math
+import os
+import numpy as np
 
-from tqdm import tqdm
 from time import perf_counter as timer
+from concurrent.futures import ProcessPoolExecutor
 
-from simulation.detect import cusum
+from simulation import instrument, scoring
+from simulation.detect import change_points
+from simulation.detectors import REGISTRY, create
 from simulation.elevator import runtime
 from simulation.elevator.runtime import Config
-from simulation.elevator.simulator import Elevator
-from simulation.log import ChangeWriter
+from simulation.elevator.batch import BatchElevator
+from simulation.elevator.noise import resolve
+from simulation.elevator.store import TraceStore
 
 
-def run(sensor, category):
-    runtime.setup()
+MIN_LANES = 64      # Narrower batches lose most of the batch engine's edge over the scalar one
+MAX_LANES = 256     # Bounds the traces and rows a unit holds, and how long rows wait to reach disk
+
+
+def lanes(runs, workers):
+    """
+    Runs per unit of work. Serial sweeps simulate up to `MAX_LANES` runs
+    per batch, pooled ones aim for 4 units per worker of at least `MIN_LANES` runs,
+    narrower when that floor would leave workers without a unit.
+    """
+    if workers <= 1:
+        return max(1, min(runs, MAX_LANES))
+    width = max(math.ceil(runs / (workers * 4)), MIN_LANES)
+    if math.ceil(runs / width) < workers:
+        width = max(1, runs // workers)
+    return min(width, MAX_LANES)
+
+
+def evaluate(sweep, sensor, category, seed, params, detectors, joint, profile, runs, offset=0):
+    """
+    Simulate runs `[offset, offset + runs)`, score every detector against
+    each trace and store the traces with their alarms in sweep `sweep` under
+    their run index. Returns the summary rows and this unit's instrumentation
+    stats. Rows refer to their alarms by trace and `entry`, the detector and
+    parameter set's position among those scored on every trace.
+    """
+    instrument.enable(profile)
+    with instrument.capture() as stats:
+        traces, entries, alarms = [], [], []
+        meta = {'sweep': sweep, 'sensor': sensor or 'temp'}
+        others = [create(name, sensor or 'temp') for name in detectors if name != 'cusum']
+        labels = [{'detector': 'cusum', **param} for param in params] if 'cusum' in detectors else []
+        labels += [{'detector': detector.name} for detector in others]
+        with instrument.stage("simulate"):
+            pairs = list(BatchElevator(seed).attack(category, runs, offset))
+
+        for cycle, (category, trace) in enumerate(pairs, start=offset):
+            lane, found = len(traces), []
+            traces.append(trace)
+            if 'cusum' in detectors:
+                with instrument.stage("detect"), instrument.stage("cusum"):
+                    found.extend(change_points(trace, sensor or 'temp', verify_state=bool(category != 'BIAS'),
+                                               params=params, joint=joint))
+
+            for detector in others:
+                with instrument.stage("detect"), instrument.stage(detector.name):
+                    found.append(np.flatnonzero(detector.score(trace)))
+
+            entries.extend((lane, spikes, {**meta, 'cycle': cycle, 'trace': cycle, 'entry': entry, **label})
+                           for entry, (spikes, label) in enumerate(zip(found, labels)))
+            alarms.append(found)
+
+        with instrument.stage("store"):
+            TraceStore.of(sweep).write(offset, [trace for _, trace in pairs], alarms)
+
+        with instrument.stage("score"):
+            rows = scoring.records(traces, entries)
+        instrument.count("alarms", sum(len(spikes) for _, spikes, _ in entries))
+    return rows, stats.export()
+
+
+def run(sensor, category, seed=Config.SEED, workers=Config.WORKERS, detectors=('cusum',), joint=None,
+        profile=Config.PROFILE, dump=False, render=False):
+    # Progress bars and the DataFrame layer are only needed by the parent, keep them out of worker start up
+    from tqdm import tqdm
+    from simulation.history import History
+    from simulation.log import ResultSink
+
+    root = runtime.setup()
+    sweep = os.path.basename(root)
+    instrument.reset()
+    instrument.enable(profile)
 
-    summary = []
     thresholds = [4, 6, 8]
     drifts = [0.3, 0.5, 0.7, 0.9]
-    attacks = {rnd: [] for rnd in range(Config.SIMULATION_ROUNDS)}
+    params = [{'drift': drift, 'threshold': threshold} for drift, threshold in itertools.product(drifts, thresholds)]
+
+    seed = resolve(seed)
+    history = History()
+    history.record(sweep, seed, category, sensor, detectors, {
+        **{key: value for key, value in vars(Config).items() if key.isupper()},
+        'workers': workers, 'joint': joint, 'params': params
+    })
+
+    # Every run draws from its own (seed, run) stream, so any split of the runs reproduces the serial output
+    chunk = lanes(Config.SIMULATION_RUNS, workers)
+    offsets = list(range(0, Config.SIMULATION_RUNS, chunk))
+    sizes = [min(chunk, Config.SIMULATION_RUNS - offset) for offset in offsets]
+    task = functools.partial(evaluate, sweep, sensor, category, seed, params, list(detectors), joint, profile)
 
     begin = timer()
-    for drift, threshold in itertools.product(drifts, thresholds):
-        sim = Elevator()
-        for cycle in tqdm(range(Config.SIMULATION_RUNS), ascii=True, desc=f"Cusum(drift={drift}, threshold={threshold}) - "):
-            category, temps, weights, readings = sim.attack(category)
-            for state in readings:
-                if state.get('attack', {}).get('launched', False):
-                    attacks[cycle] = attacks.get(cycle, []) + [state.get('cycle')]
-
-            defects = cusum(
-                temps if sensor == 'temp' else weights,
-                [r.get(sensor or 'temp') for r in readings],
-                readings,
-                verify_state=bool(category != 'BIAS'),
-                params={'drift': drift, 'threshold': threshold},
-                meta={'property': 'temp', 'category': category, 'cycle': cycle, 'attacks': attacks.get(cycle)}
-            )
-            defects.update({'cycle': cycle, 'drift': drift, 'threshold': threshold})
-            summary.append(defects)
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(instrument.stage("sweep"))
+        sink = stack.enter_context(ResultSink(root, history))
+        if workers > 1:
+            units = stack.enter_context(ProcessPoolExecutor(workers)).map(task, sizes, offsets)
+        else:
+            units = map(task, sizes, offsets)
+
+        for unit in tqdm(units, total=len(offsets), ascii=True,
+                         desc=f"Cusum(runs={Config.SIMULATION_RUNS}, grid={len(params)}, workers={workers}) - "):
+            rows, stats = unit
+            sink.append(rows)
+            instrument.merge(stats)
 
     duration = timer() - begin
-    writer = ChangeWriter(summary)
-    return writer.log(), duration
+    history.close()
+    frame = sink.plot()
+    if render:
+        sink.render(workers=workers)
+
+    if dump:
+        instrument.dump(os.path.join(root, "profile.json"))
+    return frame, duration
 
 
 if __name__ == "__main__":
     A = argparse.ArgumentParser()
     A.add_argument("-a", "--attack", help="target attack category")
-    A.add_argument("-s", "--sensor", help="target system sensor", default='temp')
+    A.add_argument("-s", "--sensor", help="target system sensor(s), eg: temp,weight", default='temp')
+    A.add_argument("--seed", help="master seed, reproduces every run", type=int, default=Config.SEED)
+    A.add_argument("-w", "--workers", help="number of worker processes", type=int, default=Config.WORKERS)
+    A.add_argument("--joint", help="also alarm when summed channel statistics exceed JOINT x threshold", type=float)
+    A.add_argument("-d", "--detectors", help=f"comma separated detectors, from {', '.join(REGISTRY)}", default='cusum')
+    A.add_argument("--render", help="save a figure of every result row to the sweep's plots/", action="store_true")
+    A.add_argument("--profile", help="print a per-stage timing breakdown", action="store_true", default=Config.PROFILE)
+    A.add_argument("--profile-json", help="also write the breakdown to the sweep's profile.json", action="store_true")
     args = A.parse_args()
 
-    category = args.attack or random.choice(Config.ATTACK_TYPES)
-    defects, duration = run(args.sensor or "temp", category)
+    seed = resolve(args.seed)
+    # Drawn from the master seed's root sequence, which no run's (seed, run) child shares
+    category = args.attack or str(np.random.default_rng(seed).choice(Config.ATTACK_TYPES))
+    profile = args.profile or args.profile_json
+    defects, duration = run(args.sensor or "temp", category, seed, args.workers, args.detectors.split(','), args.joint,
+                            profile, args.profile_json, args.render)
 
-    print("\n", defects.to_frame().T)
-    print(f"\ntime elapsed: {duration} seconds")
\ No newline at end of file
+    print("\n", "No results to plot" if defects is None else defects.to_frame().T)
+    print(f"\nseed: {seed}")
+    print(f"time elapsed: {duration} seconds")
+    if profile:
+        print(f"\n{instrument.breakdown()}")
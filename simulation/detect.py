@@ -1,28 +1,15 @@
 
+import numpy as np
+
+from simulation import instrument
 from simulation.elevator.utils import group
+from simulation.rules import columns, engine
 
 
 def verify(state):
-    try:
-        assert state.get('weight') < state.get('MAX_WEIGHT'), "Weight exceeds threshold"
-        assert state.get('temp') < state.get('MAX_TEMP'), "Temperature exceeds threshold"
-
-        # TODO: Decide if you can move to level 1 when already at level 1?
-        # assert state.get('currentLevel1') and state.get('movingToLevel1'), "Cannot move to level 1, already at level 1"
-        # assert state.get('moving') and state.get('doorOpening'), "Door open when elevator is moving"
-
-        if bool(state.get('fire_alarm', False)):
-            assert state.get('temp') > state.get('MAX_TEMP'),\
-                    "Fire alarm raised when temprature is within thresholds"
-
-        if bool(state.get('overweight_alarm', False)):
-            assert state.get('weight') > state.get('MAX_WEIGHT'),\
-                    "Weight alarm raised when wieght is within thresholds"
-    except AssertionError as err:
-        # tqdm.write(err.args[0])
-        return False
-
-    return True
+    """ True when a single reading satisfies every enabled rule """
+    instrument.count("verify")
+    return bool(engine.holds(state))
 
 
 def analyze(changes, context):
@@ -69,6 +56,7 @@ def cusum(
     hits, misses = 0, 0
     pos, neg = [0], [0]
     drift, threshold = params.get('drift'), params.get('threshold')
+    violated = engine.broken(columns(readings)) if verify_state else None
 
     for ts, (std, obs, state) in enumerate(zip(standard, observed, readings)):
         deviation = abs(std - obs)
@@ -76,7 +64,7 @@ def cusum(
         neg.append(max(0, neg[-1] - deviation - drift))
 
         if pos[-1] > threshold or neg[-1] > threshold:
-            is_valid = True if not verify_state else not verify(state)
+            is_valid = True if not verify_state else violated[ts]
             if is_valid:
                 spikes.append(ts)
                 pos[-1], neg[-1] = 0, 0
@@ -94,3 +82,141 @@ def cusum(
         'change_points': spikes,
         'readings': readings
     }, context={'hits': hits, 'misses': misses})
+
+
+def cusum_grid(residuals, drifts, thresholds, valid=None, joint=None):
+    """
+    Run one CUSUM lane per (drift, threshold) pair over a residual series.
+    `drifts` and `thresholds` are broadcast against each other; `valid` is an
+    optional per-sample mask gating which threshold crossings count as alarms.
+
+    A 2D `(samples, channels)` series keeps separate statistics per channel;
+    a lane alarms when any channel crosses its threshold or, with `joint` set,
+    when the channels' summed statistic exceeds `joint * threshold`. Alarms
+    reset every channel of the lane. Returns the change points of every lane.
+    """
+    deviations = np.abs(np.asarray(residuals, dtype=np.float64))
+    if deviations.ndim == 1:
+        deviations = deviations[:, None]
+    drifts, thresholds = np.broadcast_arrays(np.asarray(drifts, dtype=np.float64),
+                                             np.asarray(thresholds, dtype=np.float64))
+    drifts, thresholds = drifts.ravel()[:, None], thresholds.ravel()[:, None]
+
+    shape = (len(drifts), deviations.shape[1])
+    pos, neg = np.zeros(shape), np.zeros(shape)
+    alarms = np.zeros((len(deviations), len(drifts)), dtype=bool)
+    tally, crossings = instrument.enabled, 0
+    for ts, deviation in enumerate(deviations):
+        np.maximum(0, pos + deviation - drifts, out=pos)
+        np.maximum(0, neg - deviation - drifts, out=neg)
+
+        hit = ((pos > thresholds) | (neg > thresholds)).any(axis=1)
+        if joint is not None:
+            hit |= pos.sum(axis=1) > joint * thresholds[:, 0]
+        if tally:
+            crossings += int(np.count_nonzero(hit))
+        if hit.any() and (valid is None or valid[ts]):
+            pos[hit], neg[hit] = 0, 0
+            alarms[ts] = hit
+
+    instrument.count("crossings", crossings)
+    return [np.flatnonzero(lane) for lane in alarms.T]
+
+
+def sweep(
+    trace,
+    sensor='temp',
+    verify_state=True,
+    params=[{'drift': 0, 'threshold': 0}],
+    meta={'attacks': {}, 'category': None, 'property': None}
+):
+    """ Equivalent to calling `cusum` on `trace` once per entry of `params`, in a single pass """
+    return [report(trace, spikes, meta) for spikes in change_points(trace, sensor, verify_state, params)]
+
+
+def change_points(trace, sensor='temp', verify_state=True, params=[{'drift': 0, 'threshold': 0}], joint=None):
+    """ CUSUM change points of `trace` for every entry of `params`, `sensor` may name several channels """
+    sensors = sensor.split(',') if isinstance(sensor, str) else list(sensor)
+    residuals = np.column_stack([trace.standard(s).astype(np.float64) - trace[s] for s in sensors])
+    valid = engine.broken(trace) if verify_state else None
+    instrument.count("verify", len(trace) if verify_state else 0)
+    return cusum_grid(residuals,
+                      [p.get('drift') for p in params],
+                      [p.get('threshold') for p in params], valid, joint)
+
+
+class CusumDetector:
+    """
+    Online CUSUM keeping only the current statistics, equivalent to `cusum`
+    fed one sample at a time. Alarms are reported as absolute sample indices.
+    """
+    def __init__(self, drift=0, threshold=0, verify_state=True):
+        self.drift = drift
+        self.threshold = threshold
+        self.verify_state = verify_state
+        self.pos, self.neg, self.samples = 0, 0, 0
+
+    def update(self, residual, state=None):
+        """
+        Consume one residual, True on alarm. With `verify_state` set a crossing
+        only alarms when the reading `state` breaks a rule, so it is required.
+        """
+        if self.verify_state and state is None:
+            raise ValueError("CusumDetector(verify_state=True).update needs the reading `state` to verify")
+        deviation = abs(residual)
+        self.samples += 1
+        self.pos = max(0, self.pos + deviation - self.drift)
+        self.neg = max(0, self.neg - deviation - self.drift)
+
+        if self.pos > self.threshold or self.neg > self.threshold:
+            if not self.verify_state or not verify(state):
+                self.pos, self.neg = 0, 0
+                return True
+        return False
+
+    def update_many(self, residuals, valid=None):
+        """
+        Consume a block of residuals, alarms like `update` sample for sample.
+        With `verify_state` set, `valid` is the per-sample result of `verify`
+        negated, eg: `engine.broken(trace)`, and gates crossings like in
+        `cusum_grid`; without it every crossing alarms and `valid` is ignored.
+        """
+        if self.verify_state and valid is None:
+            raise ValueError("CusumDetector(verify_state=True).update_many needs the `valid` mask of the readings")
+        alarms = []
+        pos, neg, drift, threshold = self.pos, self.neg, self.drift, self.threshold
+        gates = np.asarray(valid, dtype=bool).tolist() if self.verify_state else [True] * len(residuals)
+
+        for ts, (residual, gate) in enumerate(zip(np.asarray(residuals, dtype=np.float64).tolist(), gates)):
+            deviation = abs(residual)
+            pos = max(0, pos + deviation - drift)
+            neg = max(0, neg - deviation - drift)
+            if (pos > threshold or neg > threshold) and gate:
+                alarms.append(self.samples + ts)
+                pos, neg = 0, 0
+
+        self.pos, self.neg = pos, neg
+        self.samples += len(gates)
+        return np.array(alarms, dtype=np.int64)
+
+    def snapshot(self):
+        return {'pos': self.pos, 'neg': self.neg, 'samples': self.samples}
+
+    def restore(self, snapshot):
+        self.pos, self.neg, self.samples = snapshot['pos'], snapshot['neg'], snapshot['samples']
+        return self
+
+
+def report(trace, spikes, meta={'attacks': {}, 'category': None, 'property': None}):
+    """ Score the change points `spikes` of `trace` against its launched attacks """
+    launched, counts = trace['launched'], trace['count']
+    hits = int(counts[spikes][launched[spikes]].sum())
+    misses = int(counts[spikes][~launched[spikes]].sum())
+    return analyze({
+        'category': meta.get('category'),
+        'samples': len(trace),
+        'attacks': len(meta.get('attacks', []) or []),
+        'attack_points': list(meta.get('attacks', []) or []),
+        'change_points': np.asarray(spikes).tolist(),
+        'readings': trace
+    }, context={'hits': hits, 'misses': misses})
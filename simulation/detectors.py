@@ -0,0 +1,165 @@
+import numpy as np
+
+from simulation.detect import CusumDetector, cusum_grid
+from simulation.rules import engine
+
+
+REGISTRY = {}
+
+
+def register(name):
+    """ Make a `Detector` subclass selectable by `name` """
+    def wrap(cls):
+        cls.name = name
+        REGISTRY[name] = cls
+        return cls
+    return wrap
+
+
+def create(name, sensor='temp', **params):
+    """
+    Build a detector by name, 'peak+rules' combines several with their default
+    parameters and 'temp,weight' runs one instance per sensor
+    """
+    if ',' in sensor:
+        return Union([create(name, part, **params) for part in sensor.split(',')], name)
+    if '+' in name:
+        return Union([create(part, sensor) for part in name.split('+')])
+    if name not in REGISTRY:
+        raise KeyError(f"Unknown detector '{name}', choose from {sorted(REGISTRY)}")
+    return REGISTRY[name](sensor, **params)
+
+
+class Detector:
+    """
+    Shared detector interface. `score(trace)` flags every alarming sample of
+    a whole trace in one vectorized call; `update(row)` consumes one
+    `Trace.row` at a time and must agree with `score` sample for sample.
+    """
+    name = None
+
+    def __init__(self, sensor='temp', **params):
+        self.sensor = sensor
+        self.params = params
+        self.reset()
+
+    def reset(self):
+        pass
+
+    def score(self, trace):
+        raise NotImplementedError
+
+    def update(self, row):
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f"{type(self).__name__}(sensor={self.sensor!r}, {self.params})"
+
+
+@register('cusum')
+class Cusum(Detector):
+    def __init__(self, sensor='temp', drift=0.5, threshold=6, verify_state=True):
+        super().__init__(sensor, drift=drift, threshold=threshold, verify_state=verify_state)
+
+    def reset(self):
+        self.online = CusumDetector(**self.params)
+
+    def score(self, trace):
+        valid = engine.broken(trace) if self.params['verify_state'] else None
+        spikes, = cusum_grid(trace.standard(self.sensor).astype(np.float64) - trace[self.sensor],
+                             self.params['drift'], self.params['threshold'], valid)
+        alarms = np.zeros(len(trace), dtype=bool)
+        alarms[spikes] = True
+        return alarms
+
+    def update(self, row):
+        return self.online.update(row[f"standard_{self.sensor}"] - row[self.sensor], row)
+
+
+@register('peak')
+class Peak(Detector):
+    """ Jump between consecutive samples, `misc/legacy.py::peak_detection` """
+    def __init__(self, sensor='temp', threshold=3):
+        super().__init__(sensor, threshold=threshold)
+
+    def reset(self):
+        self.last = None
+
+    def score(self, trace):
+        alarms = np.zeros(len(trace), dtype=bool)
+        alarms[1:] = np.abs(np.diff(trace[self.sensor].astype(np.float64))) > self.params['threshold']
+        return alarms
+
+    def update(self, row):
+        previous, self.last = self.last, float(row[self.sensor])
+        return previous is not None and abs(self.last - previous) > self.params['threshold']
+
+
+@register('variance')
+class Variance(Detector):
+    """ Running variance of the sensor so far, `misc/legacy.py::variance_analysis` """
+    def __init__(self, sensor='temp', threshold=5):
+        super().__init__(sensor, threshold=threshold)
+
+    def reset(self):
+        self.count, self.mean, self.m2 = 0, 0.0, 0.0
+
+    def score(self, trace):
+        values = trace[self.sensor].astype(np.float64)
+        if not len(values):
+            return np.zeros(0, dtype=bool)
+        shifted = values - values[0]
+        n = np.arange(1, len(values) + 1)
+        mean = np.cumsum(shifted) / n
+        variance = np.maximum(0, np.cumsum(shifted ** 2) / n - mean ** 2)
+        return variance > self.params['threshold']
+
+    def update(self, row):
+        value = float(row[self.sensor])
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        return self.m2 / self.count > self.params['threshold']
+
+
+@register('rules')
+class Rules(Detector):
+    """ Fixed plausibility limits, `misc/legacy.py::rule_checking` """
+    def __init__(self, sensor='temp', floor=50, max_weight=600):
+        super().__init__(sensor, floor=floor, max_weight=max_weight)
+
+    def score(self, trace):
+        return (trace[self.sensor] < self.params['floor']) | (trace['MAX_WEIGHT'] < self.params['max_weight'])
+
+    def update(self, row):
+        return bool(row[self.sensor] < self.params['floor'] or row['MAX_WEIGHT'] < self.params['max_weight'])
+
+
+@register('consistency')
+class Consistency(Detector):
+    """ Buttons disagreeing with the current level, `misc/legacy.py::signal_consistency_checking` """
+    def score(self, trace):
+        level = trace['currentLevel']
+        return (trace['ButtonLevel1'] != level) & (trace['ButtonLevel2'] != level)
+
+    def update(self, row):
+        return bool(row['ButtonLevel1'] != row['currentLevel'] and row['ButtonLevel2'] != row['currentLevel'])
+
+
+class Union(Detector):
+    """ Alarms whenever any of its members does """
+    def __init__(self, members, name=None):
+        self.members = members
+        self.name = name or '+'.join(member.name for member in members)
+        super().__init__(','.join(dict.fromkeys(member.sensor for member in members)))
+
+    def reset(self):
+        for member in self.members:
+            member.reset()
+
+    def score(self, trace):
+        return np.logical_or.reduce([member.score(trace) for member in self.members])
+
+    def update(self, row):
+        return any([member.update(row) for member in self.members])
@@ -0,0 +1,66 @@
+import enum
+import numpy as np
+
+
+class Attack(enum.IntFlag):
+    """ Attack types as bits, so a cycle's active attacks fit in one byte """
+    NONE = 0
+    BIAS = enum.auto()
+    SURGE = enum.auto()
+    RANDOM = enum.auto()
+    BUTTON_ATTACK = enum.auto()
+    ATTACK_MAX_TEMP = enum.auto()
+    ATTACK_MAX_WEIGHT = enum.auto()
+
+    @classmethod
+    def parse(cls, category):
+        """ 'ATTACK_MAX_TEMP,SURGE' -> Attack.ATTACK_MAX_TEMP | Attack.SURGE """
+        kinds = cls.NONE
+        for name in (category or "NONE").split(','):
+            if name:
+                kinds |= cls[name]
+        return kinds
+
+
+class AttackPlan:
+    """
+    Attack schedule of a single run, compiled once into a per-cycle array of
+    `Attack` bits. `windows` maps each attack type to its `[start, end)` cycle
+    windows, several per type are allowed.
+    """
+    def __init__(self, windows, cycles, category=None):
+        self.cycles = cycles
+        self.windows = {Attack.parse(kind) if isinstance(kind, str) else Attack(kind): list(spans)
+                        for kind, spans in windows.items()}
+        self.flags = np.zeros(cycles, dtype=np.uint8)
+        for kind, spans in self.windows.items():
+            for start, end in spans:
+                self.flags[max(0, start):max(0, min(end, cycles))] |= kind
+
+        self.kinds = Attack.NONE
+        for kind in self.windows:
+            self.kinds |= kind
+        self.category = category or ",".join(kind.name for kind in Attack if kind and kind in self.kinds) or "NONE"
+
+    @classmethod
+    def compile(cls, category, start, end, cycles):
+        """ Legacy single-window plan, every type in `category` shares `[start, end)` """
+        return cls({Attack.parse(category): [(start, end)]}, cycles, category)
+
+    @classmethod
+    def stack(cls, category, starts, ends, cycles):
+        """ Single-window flags for a batch of lanes, shaped `(lanes, cycles)` """
+        span = np.arange(cycles)
+        active = (np.asarray(starts)[:, None] <= span) & (span < np.asarray(ends)[:, None])
+        return np.where(active, np.uint8(Attack.parse(category)), np.uint8(0))
+
+    def at(self, cycle):
+        """ `Attack` bits active at `cycle` as a plain int, none past the end of the plan """
+        return int(self.flags[cycle]) if 0 <= cycle < self.cycles else 0
+
+    def mask(self, kind):
+        """ Per-cycle boolean mask of the cycles `kind` is active """
+        return (self.flags & np.uint8(kind)) != 0
+
+    def __repr__(self):
+        return f"AttackPlan(category={self.category!r}, cycles={self.cycles}, windows={dict(self.windows)})"
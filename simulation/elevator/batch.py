@@ -0,0 +1,275 @@
+import numpy as np
+
+from dataclasses import dataclass, fields
+
+from simulation import instrument
+from simulation.elevator.attacks import Attack, AttackPlan
+from simulation.elevator.noise import NOISE_KEYS, NoiseBank, resolve
+from simulation.elevator.runtime import Config
+from simulation.elevator.trace import Trace
+
+
+@dataclass
+class BatchState:
+    """ Struct-of-arrays twin of `ElevatorState`, one lane per elevator """
+    MAX_TEMP: np.ndarray
+    MAX_WEIGHT: np.ndarray
+    moving: np.ndarray
+    doorOpen: np.ndarray
+    fireAlarm: np.ndarray
+    doorOpening: np.ndarray
+    doorClosing: np.ndarray
+    ButtonLevel1: np.ndarray
+    ButtonLevel2: np.ndarray
+    movingToLevel1: np.ndarray
+    movingToLevel2: np.ndarray
+    currentLevel: np.ndarray
+    weight: np.ndarray
+    ThresTemp: np.ndarray
+
+    @classmethod
+    def create(cls, n, weight, ThresTemp):
+        """ Initialise `n` elevators with the same defaults as `ElevatorState` """
+        lanes = {f.name: np.zeros(n, dtype=np.int64) for f in fields(cls)}
+        lanes['MAX_TEMP'][:] = 100
+        lanes['MAX_WEIGHT'][:] = 1200
+        lanes['currentLevel'][:] = Config.INITIAL_CURRENT_LEVEL
+        lanes['weight'][:] = weight
+        lanes['ThresTemp'][:] = ThresTemp
+        return cls(**lanes)
+
+    def __len__(self):
+        return len(self.moving)
+
+    def lane(self, idx):
+        """ Snapshot a single elevator as a plain dict """
+        return {f.name: getattr(self, f.name)[idx].item() for f in fields(self)}
+
+
+class BatchElevator:
+    """
+    Advances N elevators in lockstep. Every method mirrors its
+    `Elevator` counterpart with the branches replaced by lane masks.
+    Lane `i` of a batch started at `offset` draws from the same stream as
+    `Elevator(seed, run=offset + i)`, so both engines produce identical traces.
+    """
+    def __init__(self, seed=Config.SEED):
+        self.seed = resolve(seed)
+
+    def get_noisy_elevator_state(self, state, noise):
+        """ Get the elevator status under noise """
+        noise = dict(zip(NOISE_KEYS, noise))
+        temp = state.ThresTemp + noise["ThresTemp"]
+        weight = state.weight + noise["weight"]
+        fire_alarm = temp > state.MAX_TEMP
+        overweight_alarm = weight > state.MAX_WEIGHT
+        return {
+            "fire_alarm": fire_alarm,
+            "overweight_alarm": overweight_alarm,
+            "ThresTemp": temp,
+            "moving": np.where(fire_alarm | overweight_alarm, 0, (state.moving + noise["moving"] > 0.5)).astype(np.int64),
+            "movingToLevel1": (state.movingToLevel1 + noise["movingToLevel1"] > 0.5).astype(np.int64),
+            "movingToLevel2": (state.movingToLevel2 + noise["movingToLevel2"] > 0.5).astype(np.int64),
+            "doorOpen": (state.doorOpen + noise["doorOpen"] > 0.5).astype(np.int64),
+            "weight": weight,
+        }
+
+    def update(self, state: BatchState, noise: dict):
+        s = state
+        changed = np.zeros(len(s), dtype=bool)
+
+        m = s.weight > 0
+        s.fireAlarm[m] = (s.weight > s.MAX_WEIGHT)[m]
+
+        m = s.doorOpen != 0
+        s.doorOpening[m] = 0
+        s.doorClosing[m] = 0
+
+        s.doorOpen[s.doorOpening != 0] = 0
+        s.doorOpen[s.doorClosing != 0] = 0
+
+        m = (s.doorOpening != 0) & ~changed
+        changed |= m
+        s.doorOpening[m] = 0
+        s.doorOpen[m] = 1
+
+        m = (s.doorClosing != 0) & ~changed
+        changed |= m
+        s.doorClosing[m] = 0
+        s.doorOpen[m] = 0
+        s.moving[m & ((s.movingToLevel1 != 0) | (s.movingToLevel2 != 0))] = 1
+
+        s.doorClosing[(s.doorClosing != 0) & (s.fireAlarm != 0)] = 0
+
+        m = (s.fireAlarm == 0) & (s.doorOpen != 0) & ~changed
+        heavy = s.weight > s.MAX_WEIGHT
+        s.doorOpen[m & heavy] = 1
+        m &= ~heavy
+        changed |= m
+        s.doorOpen[m] = 0
+        s.doorClosing[m] = 1
+
+        m = (s.moving != 0) & ~changed
+        changed |= m
+        s.moving[m] = 0
+        s.doorOpening[m] = 1
+        to1 = m & (s.movingToLevel1 != 0)
+        to2 = m & ~to1
+        s.currentLevel[to1] = 1
+        s.movingToLevel1[to1] = 0
+        s.currentLevel[to2] = 2
+        s.movingToLevel2[to2] = 0
+
+        s.moving[(s.moving != 0) & ((s.fireAlarm != 0) | noise["overweight_alarm"])] = 0
+
+        idle = s.moving == 0
+        m = idle & (s.fireAlarm != 0) & (s.doorOpening == 0) & (s.doorOpen == 0)
+        s.doorOpening[m] = 1
+        s.doorClosing[m] = 0
+
+        m = idle & (s.fireAlarm == 0) & (s.doorOpen == 0) & (s.doorOpening == 0) & ~changed
+        changed |= m
+        b2 = m & (s.ButtonLevel2 != 0)
+        b1 = m & (s.ButtonLevel2 == 0) & (s.ButtonLevel1 != 0)
+        for button, level, towards, away in ((b2, 2, s.movingToLevel2, s.movingToLevel1),
+                                             (b1, 1, s.movingToLevel1, s.movingToLevel2)):
+            go = button & (s.currentLevel != level)
+            towards[go] = 1
+            s.moving[go] = 1
+            stay = button & (s.currentLevel == level)
+            away[stay] = 1
+            s.doorOpening[stay] = 1
+
+        s.ButtonLevel1[:] = 0
+        s.ButtonLevel2[:] = 0
+
+    def launch_attack(self, flags, state, noise, inputs):
+        """ `flags` holds each lane's `Attack` bits for the current cycle """
+        count = np.zeros(len(state), dtype=np.int64)
+        if not flags.any():
+            return state, noise, count > 0, count
+
+        active = (flags & np.uint8(Attack.SURGE)) != 0
+        if active.any():
+            count += active
+            noise["ThresTemp"] = np.where(active, 120, noise["ThresTemp"])
+
+        active = (flags & np.uint8(Attack.BIAS)) != 0
+        if active.any():
+            count += active
+            noise["ThresTemp"] = np.where(active, noise["ThresTemp"] + inputs['bias'], noise["ThresTemp"])
+
+        active = (flags & np.uint8(Attack.RANDOM)) != 0
+        if active.any():
+            count += active
+            noise["ThresTemp"] = np.where(active, noise["ThresTemp"] + inputs['random'], noise["ThresTemp"])
+
+        active = (flags & np.uint8(Attack.ATTACK_MAX_TEMP)) != 0
+        if active.any():
+            count += active
+            state.MAX_TEMP[active] = 20
+
+        active = (flags & np.uint8(Attack.ATTACK_MAX_WEIGHT)) != 0
+        if active.any():
+            count += active
+            state.MAX_WEIGHT[active] = 10
+
+        active = (flags & np.uint8(Attack.BUTTON_ATTACK)) != 0
+        if active.any():
+            b1 = active & (state.ButtonLevel1 != 0)
+            b2 = active & (state.ButtonLevel1 == 0) & (state.ButtonLevel2 != 0)
+            count += b1 | b2
+            for button, level, away, towards in ((b1, 1, state.movingToLevel2, state.movingToLevel1),
+                                                 (b2, 2, state.movingToLevel1, state.movingToLevel2)):
+                here = button & (state.currentLevel == level)
+                away[here] = 1
+                state.moving[here] = 1
+                there = button & (state.currentLevel != level)
+                towards[there] = 0
+                state.moving[there] = 0
+
+        return state, noise, count > 0, count
+
+    def simulate(
+        self,
+        state: BatchState,
+        cycles: int,
+        attack_type: str="NONE",
+        attack_start=1,
+        attack_end=Config.SIMULATION_ROUNDS,
+        plans=None,
+        offset=0
+    ):
+        """
+        Run every lane of `state` for `cycles` rounds, under one `AttackPlan` per
+        lane if `plans` is given, or else the single attack window, whose bounds
+        may be scalars or per-lane arrays. Lane `i` draws the inputs of run
+        `offset + i` from their first cycle on, whatever ran before, like a
+        fresh `Elevator(seed, offset + i)`. Returns one `Trace` per lane, each a
+        view into a shared `(n, cycles)` column block.
+        """
+        n = len(state)
+        if plans is None:
+            flags = AttackPlan.stack(attack_type, np.broadcast_to(attack_start, (n,)),
+                                     np.broadcast_to(attack_end, (n,)), cycles)
+            categories = [attack_type] * n
+        else:
+            flags = np.stack([np.pad(plan.flags[:cycles], (0, max(0, cycles - plan.cycles))) for plan in plans])
+            categories = [plan.category for plan in plans]
+
+        instrument.count("cycles", n * cycles)
+        columns = Trace.allocate(n, cycles)
+        bank = NoiseBank(self.seed, range(offset, offset + n))
+
+        for cycle in range(cycles):
+            inputs = bank.next()
+            noise = self.get_noisy_elevator_state(state, inputs['noise'])
+
+            pressed = (state.moving == 0) & (inputs['press'] == 1)
+            state.ButtonLevel1[pressed & (inputs['level'] == 1)] = 1
+            state.ButtonLevel2[pressed & (inputs['level'] != 1)] = 1
+
+            state, noise, attacked, count = self.launch_attack(flags[:, cycle], state, noise, inputs)
+
+            columns["standard_temp"][:, cycle] = state.ThresTemp
+            columns["standard_weight"][:, cycle] = state.weight
+            columns["launched"][:, cycle] = attacked
+            columns["count"][:, cycle] = count
+            for key in ("MAX_TEMP", "MAX_WEIGHT", "doorOpen", "currentLevel", "ButtonLevel1", "ButtonLevel2"):
+                columns[key][:, cycle] = getattr(state, key)
+            for key in ("moving", "weight", "fire_alarm", "movingToLevel1", "movingToLevel2", "overweight_alarm"):
+                columns[key][:, cycle] = noise[key]
+            columns["temp"][:, cycle] = noise["ThresTemp"]
+
+            self.update(state, noise)
+
+        return [Trace({key: column[idx] for key, column in columns.items()}, categories[idx]) for idx in range(n)]
+
+    def attack(self, category, runs=Config.SIMULATION_RUNS, offset=0):
+        """ Batched `Elevator.attack`, yields one `(category, trace)` pair per simulated elevator """
+        bank = NoiseBank(self.seed, range(offset, offset + runs))
+        starts, ends = bank.window(Config.SIMULATION_ROUNDS)
+        state = BatchState.create(runs, **bank.initial())
+        for trace in self.simulate(state, Config.SIMULATION_ROUNDS, category, starts, ends, offset=offset):
+            yield category, trace
+
+
+if __name__ == '__main__':
+    from simulation.elevator.simulator import Elevator, ElevatorState
+
+    # Every lane must match the scalar engine run for run, column for column
+    for category in Config.ATTACK_TYPES + ["ATTACK_MAX_TEMP,SURGE", "BIAS,BUTTON_ATTACK"]:
+        for run, (_, lane) in enumerate(BatchElevator(42).attack(category, runs=6, offset=3), start=3):
+            _, scalar = Elevator(42, run).attack(category)
+            for key in Trace.SCHEMA:
+                assert np.array_equal(lane[key], scalar[key]), (category, run, key)
+
+    # ... and so must lanes simulated from a given state, over a given attack window, whatever ran before
+    batch = BatchElevator(7)
+    for runs, offset in [(4, 0), (4, 2), (3, 2), (4, 0)]:
+        lanes = batch.simulate(BatchState.create(runs, 900, 60), 300, "SURGE,ATTACK_MAX_WEIGHT", 50, 200, offset=offset)
+        for run, lane in enumerate(lanes, start=offset):
+            state = ElevatorState(weight=900, ThresTemp=60)
+            scalar = Elevator(7, run).simulate(state, 300, "SURGE,ATTACK_MAX_WEIGHT", 50, 200)
+            for key in Trace.SCHEMA:
+                assert np.array_equal(lane[key], scalar[key]), (runs, offset, run, key)
@@ -0,0 +1,127 @@
+import numpy as np
+
+from simulation.elevator.runtime import Config
+
+
+NOISE_KEYS = ["ThresTemp", "moving", "movingToLevel1", "movingToLevel2", "doorOpen", "weight"]
+NOISE_LOWER, NOISE_UPPER = -5, 0.5
+
+
+def resolve(seed=None):
+    """ Turn an optional master seed into a concrete, recordable integer """
+    return np.random.SeedSequence(seed).entropy
+
+
+class NoiseStream:
+    """
+    Random inputs of a single simulation run. Every (seed, run) pair owns
+    an independent `SeedSequence` child, and each input kind has its own
+    generator, so the values seen at a cycle do not depend on the block
+    size or on which process draws them.
+    """
+    FIELDS = ('noise', 'press', 'level', 'bias', 'random')
+
+    def __init__(self, seed, run=0, block=Config.NOISE_BLOCK):
+        children = np.random.SeedSequence(seed, spawn_key=(run,)).spawn(2 + len(self.FIELDS))
+        self.seed, self.run, self.block = seed, run, block
+        self.setup = np.random.default_rng(children[0])
+        self.windows = np.random.default_rng(children[1])
+        self.rngs = dict(zip(self.FIELDS, map(np.random.default_rng, children[2:])))
+        self.buffer, self.cursor = self.draw(0), 0
+
+    def initial(self):
+        """ Initial sensor readings of the run, the `weight` and `ThresTemp` an `ElevatorState` starts from """
+        return {
+            'weight': int(self.setup.integers(0, 1501)),
+            'ThresTemp': int(self.setup.integers(30, 100)),
+        }
+
+    def window(self, rounds=Config.SIMULATION_ROUNDS):
+        """ Attack `(start, end)` for a run of `rounds` cycles """
+        start = int(self.windows.integers(0, rounds + 1))
+        duration = int(self.windows.integers(1, rounds + 1))
+        return start, start + duration
+
+    def draw(self, size):
+        """ Draw the inputs for the next `size` cycles straight from the generators """
+        return {
+            'noise': self.rngs['noise'].uniform(NOISE_LOWER, NOISE_UPPER, (size, len(NOISE_KEYS))),
+            'press': self.rngs['press'].integers(1, 11, size),
+            'level': self.rngs['level'].integers(1, 3, size),
+            'bias': self.rngs['bias'].choice(Config.BIAS_SELECTION, size),
+            'random': self.rngs['random'].integers(-30, 31, size),
+        }
+
+    def take(self, cycles):
+        """ Inputs for the next `cycles` cycles, served from the block buffer """
+        parts = []
+        while cycles > 0:
+            if self.cursor == len(self.buffer['press']):
+                self.buffer, self.cursor = self.draw(self.block), 0
+            step = min(cycles, len(self.buffer['press']) - self.cursor)
+            parts.append({key: values[self.cursor:self.cursor + step] for key, values in self.buffer.items()})
+            self.cursor += step
+            cycles -= step
+
+        if len(parts) == 1:
+            return parts[0]
+        return {key: np.concatenate([part[key] for part in parts]) for key in self.FIELDS}
+
+    def next(self):
+        """ Inputs for a single cycle """
+        if self.cursor == len(self.buffer['press']):
+            self.buffer, self.cursor = self.draw(self.block), 0
+        row = {key: values[self.cursor] for key, values in self.buffer.items()}
+        self.cursor += 1
+        return row
+
+
+class NoiseBank:
+    """ Lane-stacked `NoiseStream`s feeding the batch engine, refilled a block at a time """
+    def __init__(self, seed, runs, block=Config.NOISE_BLOCK):
+        self.streams = [NoiseStream(seed, run, block) for run in runs]
+        self.block = block
+        self.buffer, self.cursor = None, block
+
+    def __len__(self):
+        return len(self.streams)
+
+    def initial(self):
+        lanes = [stream.initial() for stream in self.streams]
+        return {key: np.array([lane[key] for lane in lanes]) for key in ('weight', 'ThresTemp')}
+
+    def window(self, rounds=Config.SIMULATION_ROUNDS):
+        starts, ends = zip(*[stream.window(rounds) for stream in self.streams])
+        return np.array(starts), np.array(ends)
+
+    def next(self):
+        """ Inputs for a single cycle across all lanes, noise shaped `(len(NOISE_KEYS), lanes)` """
+        if self.cursor == self.block:
+            blocks = [stream.take(self.block) for stream in self.streams]
+            self.buffer = {key: np.stack([b[key] for b in blocks]) for key in NoiseStream.FIELDS}
+            self.cursor = 0
+
+        cycle = self.cursor
+        self.cursor += 1
+        row = {key: values[:, cycle] for key, values in self.buffer.items()}
+        row['noise'] = row['noise'].T
+        return row
+
+
+if __name__ == '__main__':
+    # The inputs seen at a cycle must not depend on the block size they were drawn with
+    for block in (1, 5, 256, 1000):
+        for size in (1, 7, 333):
+            ref, stream = NoiseStream(7, 2, block=333).take(size), NoiseStream(7, 2, block=block)
+            rows = [stream.next() for _ in range(size)]
+            for key in NoiseStream.FIELDS:
+                assert np.array_equal(NoiseStream(7, 2, block=block).take(size)[key], ref[key]), (block, size, key)
+                assert np.array_equal(np.stack([row[key] for row in rows]), ref[key]), (block, size, key)
+
+    # ... nor on the lanes it is stacked with
+    bank, streams = NoiseBank(7, range(3, 6), block=5), [NoiseStream(7, run, block=64) for run in range(3, 6)]
+    for _ in range(12):
+        row, lanes = bank.next(), [stream.next() for stream in streams]
+        assert np.array_equal(row['noise'], np.stack([lane['noise'] for lane in lanes], axis=1))
+        for key in ('press', 'level', 'bias', 'random'):
+            assert np.array_equal(row[key], [lane[key] for lane in lanes]), key
@@ -1,15 +1,16 @@
 
 import os
-import shutil
+import uuid
 
+from datetime import datetime
 
-def setup(dirs=False):
-    """ Prepare the directory structure """
-    sims = os.path.join(os.path.dirname(__file__), "../..")
-    runs = os.path.join(sims, "runs")
-    if os.path.exists(runs):
-        shutil.rmtree(runs)
 
+RUNS = os.path.join(os.path.dirname(__file__), "../..", "runs")
+
+
+def setup(dirs=False):
+    """ Prepare a fresh, uniquely named sweep directory under `runs/`, earlier sweeps are kept """
+    runs = os.path.join(RUNS, f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}")
     os.makedirs(runs)
     if dirs:
         for attack in Config.ATTACK_TYPES:
@@ -30,6 +31,12 @@ class Config:
     INITIAL_CURRENT_LEVEL = 1
     SIMULATION_RUNS = int(os.getenv('SIM_RUNS', 10))                # Number of times simulation is run
     SIMULATION_ROUNDS = int(os.getenv('SIM_ROUNDS', 500))           # Number of samples generated
+    SEED = int(os.getenv('SIM_SEED')) if os.getenv('SIM_SEED') else None   # Master seed, fresh entropy if unset
+    NOISE_BLOCK = int(os.getenv('SIM_NOISE_BLOCK', 256))            # Cycles of random inputs drawn at once
+    WORKERS = int(os.getenv('SIM_WORKERS', 1))                      # Worker processes used by the sweep
+    PROFILE = bool(os.getenv('SIM_PROFILE'))                        # Record per-stage timings and counters
+    RESULTS_BATCH = int(os.getenv('SIM_RESULTS_BATCH', 1000))       # Summary rows buffered before a flush
+    PLOT_POINTS = int(os.getenv('SIM_PLOT_POINTS', 2000))           # Samples per plotted line, downsampled beyond
 
     MAX_FALSE_ALARM_RATE = float(os.getenv('MAX_ALARM', 10))
     MIN_DETECTION_EFFECTIVENESS = float(os.getenv('MIN_DETECTION', 90))
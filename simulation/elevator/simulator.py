@@ -1,16 +1,17 @@
 
-import random
-import numpy as np
-
-from typing import List
-from dataclasses import asdict, dataclass, field
+from dataclasses import asdict, dataclass
 
+from simulation.elevator.attacks import Attack, AttackPlan
+from simulation.elevator.noise import NOISE_KEYS, NoiseStream, resolve
 from simulation.elevator.runtime import Config
+from simulation.elevator.trace import Trace
 
 
 @dataclass
 class ElevatorState:
-    """ Initialise some elevator data """
+    """ Initialise some elevator data, starting from the sensor readings of `NoiseStream.initial` """
+    weight: int
+    ThresTemp: int
     MAX_TEMP: int = 100
     MAX_WEIGHT: int = 1200
     moving: int = 0
@@ -23,17 +24,16 @@ class ElevatorState:
     movingToLevel1: int = 0
     movingToLevel2: int = 0
     currentLevel: int = Config.INITIAL_CURRENT_LEVEL
-    weight: int = field(default_factory=lambda: random.randint(0, 1500))
-    ThresTemp: int = field(default_factory=lambda: random.randint(30, 99))
 
     def __dict__(self):
         return asdict(self)
 
 
 class Elevator:
-    def generate_noise(self, lower=-5, upper=0.5):
-        """ Generate noise normal deviation value """
-        return np.random.uniform(lower, upper)
+    def __init__(self, seed=Config.SEED, run=0):
+        self.seed = resolve(seed)
+        self.run = run
+        self.source = NoiseStream(self.seed, run)
 
     def get_elevator_actuators(self, state):
         """ Get the elevator status """
@@ -48,13 +48,9 @@ class Elevator:
             "fireAlarm": state.fireAlarm,
         }
 
-    def get_noisy_elevator_state(self, state):
+    def get_noisy_elevator_state(self, state, draws):
         """ Get the elevator status under noise """
-        noise = {
-            key: self.generate_noise() for key in [
-                "ThresTemp", "moving", "movingToLevel1", "movingToLevel2", "doorOpen", "weight"
-            ]
-        }
+        noise = dict(zip(NOISE_KEYS, draws))
         fire_alarm = state.ThresTemp + noise["ThresTemp"] > state.MAX_TEMP
         overweight_alarm = state.weight + noise["weight"] > state.MAX_WEIGHT
         return {
@@ -146,39 +142,34 @@ class Elevator:
         state.ButtonLevel1 = 0
         state.ButtonLevel2 = 0
 
-    def launch_attack(self, attack, cycle, state, noise):
+    def launch_attack(self, plan, cycle, state, noise, inputs):
         bias, button, surge, rand, max_temp, max_weight = False, False, False, False, False, False
 
-        attack_window = range(attack.get('attack_start'), attack.get('attack_end'))
-        if cycle not in attack_window:
+        kinds = plan.at(cycle)
+        if not kinds:
             return state, noise, False, 0
 
-        attack_type = attack.get('attack_type')
-        attack_types = attack_type.split(',')
-        if '' in attack_types:
-            attack_types.remove('')
-
-        if "SURGE" in attack_types:
+        if kinds & Attack.SURGE:
             surge = True
             noise["ThresTemp"] = 120
 
-        if "BIAS" in attack_types:
+        if kinds & Attack.BIAS:
             bias = True
-            noise["ThresTemp"] += random.choice(Config.BIAS_SELECTION)
+            noise["ThresTemp"] += inputs['bias']
 
-        if "RANDOM" in attack_types:
+        if kinds & Attack.RANDOM:
             rand = True
-            noise["ThresTemp"] += random.randint(-30, 30)
+            noise["ThresTemp"] += inputs['random']
 
-        if "ATTACK_MAX_TEMP" in attack_types:
+        if kinds & Attack.ATTACK_MAX_TEMP:
             max_temp = True
             state.MAX_TEMP = 20
 
-        if "ATTACK_MAX_WEIGHT" in attack_types:
+        if kinds & Attack.ATTACK_MAX_WEIGHT:
             max_weight = True
             state.MAX_WEIGHT = 10
 
-        if "BUTTON_ATTACK" in attack_types:
+        if kinds & Attack.BUTTON_ATTACK:
             if state.ButtonLevel1:
                 button = True
                 if state.currentLevel == 1:
@@ -200,60 +191,76 @@ class Elevator:
         attacks = [bias, button, surge, rand, max_temp, max_weight]
         return state, noise, any(attacks), attacks.count(True)
 
+    def step(self, state, cycle, plan, trace, row):
+        """ Advance `state` by one cycle and record the cycle at `row` of `trace` """
+        inputs = self.source.next()
+        noise = self.get_noisy_elevator_state(state, inputs['noise'])
+
+        if not state.moving and inputs['press'] == 1:
+            if inputs['level'] == 1:
+                state.ButtonLevel1 = 1
+            else:
+                state.ButtonLevel2 = 1
+
+        state, noise, attacked, count = self.launch_attack(plan, cycle, state, noise, inputs)
+
+        trace["standard_temp"][row] = state.ThresTemp
+        trace["standard_weight"][row] = state.weight
+        trace["launched"][row] = attacked
+        trace["count"][row] = count
+        for key in ("MAX_TEMP", "MAX_WEIGHT", "doorOpen", "currentLevel", "ButtonLevel1", "ButtonLevel2"):
+            trace[key][row] = getattr(state, key)
+        for key in ("moving", "weight", "fire_alarm", "movingToLevel1", "movingToLevel2", "overweight_alarm"):
+            trace[key][row] = noise[key]
+        trace["temp"][row] = noise["ThresTemp"]
+        self.update(state, noise)
+
     def simulate(
         self,
         state: ElevatorState,
         cycles: int,
         attack_type: str="NONE",
         attack_start: int=1,
-        attack_end: int=Config.SIMULATION_ROUNDS
+        attack_end: int=Config.SIMULATION_ROUNDS,
+        plan: AttackPlan=None
     ):
-        temps: List[int] = []               # Temperature values under normal operation
-        weights: List[int] = []             # Temperature values under noise
-        simulations: List[dict] = []        # state of the system for the current simulation cycle
+        """ Run `cycles` rounds, under `plan` if given or else the single attack window """
+        plan = plan or AttackPlan.compile(attack_type, attack_start, attack_end, cycles)
+        trace = Trace(Trace.allocate(cycles), plan.category)
 
         for cycle in range(cycles):
-            noise = self.get_noisy_elevator_state(state)
+            self.step(state, cycle, plan, trace, cycle)
+        return trace
 
-            if not state.moving and random.randint(1, 10) == 1:
-                if random.randint(1, 2) == 1:
-                    state.ButtonLevel1 = 1
-                else:
-                    state.ButtonLevel2 = 1
-
-            payload = {'attack_type': attack_type, 'attack_start': attack_start, 'attack_end': attack_end}
-            state, noise, attacked, count = self.launch_attack(payload, cycle, state, noise)
-
-            temps.append(state.ThresTemp)
-            weights.append(state.weight)
-            simulations.append({
-                "cycle": cycle,
-                "attack": {'launched': attacked, 'count': count},
-                "MAX_TEMP": state.MAX_TEMP,
-                "MAX_WEIGHT": state.MAX_WEIGHT,
-                "doorOpen": state.doorOpen,
-                "currentLevel": state.currentLevel,
-                "ButtonLevel1": state.ButtonLevel1,
-                "ButtonLevel2": state.ButtonLevel2,
-                "moving": noise["moving"],
-                "weight": noise["weight"],
-                "temp": noise["ThresTemp"],
-                "fire_alarm": noise["fire_alarm"],
-                "movingToLevel1": noise["movingToLevel1"],
-                "movingToLevel2": noise["movingToLevel2"],
-                "overweight_alarm": noise["overweight_alarm"],
-            })
-            self.update(state, noise)
-
-        return temps, weights, simulations
+    def stream(self, state: ElevatorState, plan: AttackPlan=None, chunk=None, cycles=None):
+        """
+        Run `state` for `cycles` rounds, or forever, in constant memory. Yields a
+        reading dict per cycle, or with `chunk` set, a `Trace` of that many cycles
+        whose `offset` is its first cycle. State carries over between chunks.
+        """
+        plan = plan or AttackPlan({}, 0)
+
+        offset = 0
+        while cycles is None or offset < cycles:
+            size = chunk or 1
+            if cycles is not None:
+                size = min(size, cycles - offset)
+
+            trace = Trace(Trace.allocate(size), plan.category, offset)
+            for row in range(size):
+                self.step(state, offset + row, plan, trace, row)
+            offset += size
+
+            yield trace if chunk else trace.readings[0]
 
     def attack(self, category):
         """
         Determine the simulation parameters mainly to determine
         whether there is an intermediate function of the attack
         """
-        start = random.randint(0, Config.SIMULATION_ROUNDS)
-        duration = random.randint(1, Config.SIMULATION_ROUNDS)
-        temps, weights, simulations = self.simulate(ElevatorState(), Config.SIMULATION_ROUNDS,
-                                                    category, start, start + duration)
-        return category, temps, weights, simulations
+        self.source = NoiseStream(self.seed, self.run)
+        self.run += 1
+
+        start, end = self.source.window(Config.SIMULATION_ROUNDS)
+        trace = self.simulate(ElevatorState(**self.source.initial()), Config.SIMULATION_ROUNDS, category, start, end)
+        return category, trace
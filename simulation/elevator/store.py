@@ -0,0 +1,105 @@
+import json
+import os
+import numpy as np
+
+from simulation.elevator import runtime
+from simulation.elevator.trace import Trace
+
+
+class TraceStore:
+    """
+    Traces kept on disk instead of in result rows. Every simulated batch is a
+    directory holding one `(lanes, cycles)` `.npy` file per `Trace` column,
+    named after the id of its first trace, and traces are addressed by a
+    plain integer id (the run index). The alarm indices of every detector
+    entry scored on a trace are kept alongside, flattened into one array.
+    Loading memory-maps the columns, so nothing is read until a column is
+    actually touched.
+    """
+    def __init__(self, root):
+        self.root = root
+        self.index = None
+        self.opened = {}
+
+    @classmethod
+    def of(cls, sweep):
+        """ Store of the sweep named `sweep` under `runs/` """
+        return cls(os.path.join(runtime.RUNS, sweep, "traces"))
+
+    def write(self, first, traces, alarms=None):
+        """
+        Store `traces` under ids `first, first + 1, ...`. `alarms[lane]` are the
+        alarm index lists of every detector entry scored on trace `lane`, kept
+        next to the trace so result rows only need to hold their counts.
+        """
+        batch = os.path.join(self.root, f"{first:08d}")
+        os.makedirs(batch, exist_ok=True)
+        for key in Trace.SCHEMA:
+            np.save(os.path.join(batch, f"{key}.npy"), np.stack([trace[key] for trace in traces]))
+        meta = {'first': first,
+                'categories': [trace.category for trace in traces],
+                'offsets': [trace.offset for trace in traces]}
+        if alarms is not None:
+            flat = [np.asarray(spikes, dtype=np.int32) for entries in alarms for spikes in entries]
+            np.save(os.path.join(batch, "alarms.npy"), np.concatenate(flat) if flat else np.zeros(0, dtype=np.int32))
+            np.save(os.path.join(batch, "alarm_bounds.npy"), np.cumsum([0] + [len(spikes) for spikes in flat]))
+            meta['entries'] = len(alarms[0]) if alarms else 0
+        with open(os.path.join(batch, "meta.json"), 'w') as fp:
+            json.dump(meta, fp)
+        self.index = None
+        self.opened.pop(first, None)
+        return list(range(first, first + len(traces)))
+
+    def batches(self):
+        """ Sorted first ids of every stored batch, rescanned after a write """
+        if self.index is None:
+            names = os.listdir(self.root) if os.path.isdir(self.root) else []
+            self.index = np.array(sorted(int(name) for name in names if name.isdigit()), dtype=np.int64)
+        return self.index
+
+    def open(self, first):
+        """ Metadata, memory-mapped columns and alarms of the batch starting at `first`, mapped once """
+        if first not in self.opened:
+            batch = os.path.join(self.root, f"{first:08d}")
+            with open(os.path.join(batch, "meta.json")) as fp:
+                meta = json.load(fp)
+            columns = {key: np.load(os.path.join(batch, f"{key}.npy"), mmap_mode='r') for key in Trace.SCHEMA}
+            alarms = None
+            if 'entries' in meta:
+                alarms = (np.load(os.path.join(batch, "alarms.npy"), mmap_mode='r'),
+                          np.load(os.path.join(batch, "alarm_bounds.npy")))
+            self.opened[first] = meta, columns, alarms
+        return self.opened[first]
+
+    def locate(self, tid):
+        """ Opened batch holding trace `tid` and the trace's lane in it """
+        batches = self.batches()
+        pos = np.searchsorted(batches, tid, side='right') - 1
+        if pos < 0:
+            raise KeyError(f"No stored trace {tid}")
+
+        batch = self.open(int(batches[pos]))
+        lane = int(tid) - batch[0]['first']
+        if lane >= len(batch[0]['categories']):
+            raise KeyError(f"No stored trace {tid}")
+        return batch, lane
+
+    def load(self, tid):
+        """ Memory-mapped `Trace` stored under id `tid` """
+        (meta, columns, _), lane = self.locate(tid)
+        return Trace({key: column[lane] for key, column in columns.items()}, meta['categories'][lane], meta['offsets'][lane])
+
+    def alarms(self, tid, entry):
+        """ Alarm indices of detector entry `entry` scored on trace `tid`, memory-mapped """
+        (meta, _, alarms), lane = self.locate(tid)
+        if alarms is None or not 0 <= entry < meta['entries']:
+            raise KeyError(f"No stored alarms for entry {entry} of trace {tid}")
+        values, bounds = alarms
+        idx = lane * meta['entries'] + int(entry)
+        return values[bounds[idx]:bounds[idx + 1]]
+
+    def __iter__(self):
+        """ Every stored trace id, for reanalysis """
+        for first in self.batches():
+            meta, _, _ = self.open(int(first))
+            yield from range(first, first + len(meta['categories']))
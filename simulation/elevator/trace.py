@@ -0,0 +1,105 @@
+import numpy as np
+
+from collections.abc import Sequence
+
+
+class Trace:
+    """
+    Columnar record of a simulation run, one typed NumPy column per reading
+    key. Columns are handed out as views, never copied. `offset` is the cycle
+    the trace starts at when it is one chunk of a longer stream.
+    """
+    SCHEMA = {
+        "launched": np.bool_,
+        "count": np.int8,
+        "MAX_TEMP": np.int16,
+        "MAX_WEIGHT": np.int16,
+        "doorOpen": np.int8,
+        "currentLevel": np.int8,
+        "ButtonLevel1": np.int8,
+        "ButtonLevel2": np.int8,
+        "moving": np.int8,
+        "weight": np.float32,
+        "temp": np.float32,
+        "fire_alarm": np.bool_,
+        "movingToLevel1": np.int8,
+        "movingToLevel2": np.int8,
+        "overweight_alarm": np.bool_,
+        "standard_temp": np.int16,          # Temperature values under normal operation
+        "standard_weight": np.int16,        # Elevator load under normal operation
+    }
+
+    def __init__(self, columns, category=None, offset=0):
+        lengths = {len(column) for column in columns.values()}
+        if len(lengths) != 1:
+            raise ValueError(f"Trace columns differ in length: {sorted(lengths)}")
+        self.columns = columns
+        self.category = category
+        self.offset = offset
+
+    @classmethod
+    def allocate(cls, *shape):
+        """ Preallocate zeroed columns, `shape` is `(cycles,)` or `(runs, cycles)` """
+        return {key: np.zeros(shape, dtype=dtype) for key, dtype in cls.SCHEMA.items()}
+
+    def __len__(self):
+        return len(self.columns["launched"])
+
+    def __getitem__(self, key):
+        return self.columns[key]
+
+    def __repr__(self):
+        return f"Trace(category={self.category!r}, offset={self.offset}, cycles={len(self)})"
+
+    def standard(self, sensor):
+        """ Reference values for `sensor`, what `observed` is compared against """
+        return self.columns["standard_temp" if sensor == 'temp' else "standard_weight"]
+
+    def row(self, idx):
+        """ Every column at cycle `idx`, including the reference values """
+        return {key: column[idx].item() for key, column in self.columns.items()}
+
+    @property
+    def attack_points(self):
+        return self.offset + np.flatnonzero(self.columns["launched"])
+
+    @property
+    def attack_windows(self):
+        """ Inclusive `[start, end]` rows of every contiguous attacked stretch, sorted """
+        edges = np.diff(self.columns["launched"].astype(np.int8), prepend=0, append=0)
+        starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1) - 1
+        return self.offset + np.column_stack([starts, ends])
+
+    @property
+    def readings(self):
+        return Readings(self)
+
+    @property
+    def nbytes(self):
+        return sum(column.nbytes for column in self.columns.values())
+
+
+class Readings(Sequence):
+    """ Lazy per-cycle dict view of a `Trace` for callers of the old format """
+    KEYS = [key for key in Trace.SCHEMA if key not in ("launched", "count", "standard_temp", "standard_weight")]
+
+    def __init__(self, trace):
+        self.trace = trace
+
+    def __len__(self):
+        return len(self.trace)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError(idx)
+
+        columns = self.trace.columns
+        return {
+            "cycle": self.trace.offset + idx,
+            "attack": {'launched': columns["launched"][idx].item(), 'count': columns["count"][idx].item()},
+            **{key: columns[key][idx].item() for key in self.KEYS}
+        }
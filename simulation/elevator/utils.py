@@ -1,4 +1,7 @@
 
+import numpy as np
+
+
 def merge(intervals):
     if len(intervals) <= 1:
         return intervals
@@ -6,28 +9,26 @@ def merge(intervals):
     intervals.sort()
     m = [intervals[0]]
     for curr in intervals[1:]:
-        last = m.pop()
+        last = m[-1]
 
-        if (last[1] in range(curr[0], curr[1] + 1) or
-            curr[1] in range(last[0], last[1] + 1) or
-            abs(last[1] - curr[0]) <= 1
-        ):
-            m.append((min(last[0], curr[0]), max(last[1], curr[1])))
+        # Sorted by start, so overlapping or adjacent means `curr` starts by the cycle after `last` ends
+        if curr[0] <= last[1] + 1:
+            m[-1] = (last[0], max(last[1], curr[1]))
         else:
-            m.extend([last, curr])
+            m.append(curr)
     return m
 
 
 def group(ts):
-    points = [(-1, -1)]
-    for t in ts:
-        if t == points[-1][1] + 1:
-            points[-1] = (points[-1][0], t)
-        else:
-            points.append((t, t))
-
-    del points[0]
-    return merge(points)
+    """ Inclusive intervals of consecutive time steps in `ts` """
+    ts = np.unique(np.asarray(ts, dtype=np.int64))
+    if not len(ts):
+        return []
+
+    breaks = np.flatnonzero(np.diff(ts) > 1)
+    starts = np.concatenate([[ts[0]], ts[breaks + 1]])
+    ends = np.concatenate([ts[breaks], [ts[-1]]])
+    return list(zip(starts.tolist(), ends.tolist()))
 
 
 if __name__ == '__main__':
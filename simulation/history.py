@@ -0,0 +1,100 @@
+import json
+import os
+import sqlite3
+import pandas as pd
+
+from datetime import datetime
+
+from simulation.elevator import runtime
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sweeps (
+    sweep TEXT PRIMARY KEY,
+    started TEXT,
+    seed TEXT,
+    category TEXT,
+    sensor TEXT,
+    detectors TEXT,
+    config TEXT
+);
+CREATE TABLE IF NOT EXISTS results (
+    sweep TEXT,
+    cycle INTEGER,
+    category TEXT,
+    sensor TEXT,
+    detector TEXT,
+    drift REAL,
+    threshold REAL,
+    samples INTEGER,
+    attacks INTEGER,
+    alarms INTEGER,
+    detected INTEGER,
+    false_alarms INTEGER,
+    detection_effectiveness REAL,
+    false_alarm_rate REAL,
+    trace INTEGER,
+    entry INTEGER
+);
+CREATE INDEX IF NOT EXISTS results_lookup ON results (category, sensor, drift, threshold);
+CREATE INDEX IF NOT EXISTS results_sweep ON results (sweep);
+"""
+
+ADDED = {'alarms': 'INTEGER', 'entry': 'INTEGER'}     # Columns newer than the first index schema
+
+
+class History:
+    """
+    Index of every sweep kept under `runs/`. Each sweep is recorded with its
+    config and seed, and its result rows are indexed by category, sensor,
+    drift and threshold so past sweeps can be queried without re-running them.
+    """
+    def __init__(self, root=runtime.RUNS):
+        os.makedirs(root, exist_ok=True)
+        self.root = root
+        self.db = sqlite3.connect(os.path.join(root, "index.db"))
+        self.db.executescript(SCHEMA)
+        self.migrate()
+
+    def migrate(self):
+        """ Add the columns of `ADDED` to an index created before them, earlier rows read them as NULL """
+        present = set(self.columns())
+        with self.db:
+            for column, kind in ADDED.items():
+                if column not in present:
+                    self.db.execute(f"ALTER TABLE results ADD COLUMN {column} {kind}")
+
+    def record(self, sweep, seed, category, sensor, detectors, config):
+        """ Register sweep `sweep` and keep its settings next to its results """
+        meta = (sweep, datetime.now().isoformat(timespec='seconds'), str(seed), category, sensor, ','.join(detectors))
+        with open(os.path.join(self.root, sweep, "config.json"), 'w') as fp:
+            json.dump({**dict(zip(('sweep', 'started', 'seed', 'category', 'sensor', 'detectors'), meta)),
+                       'config': config}, fp, indent=2, default=str)
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO sweeps VALUES (?, ?, ?, ?, ?, ?, ?)",
+                            (*meta, json.dumps(config, default=str)))
+
+    def add(self, changes):
+        """ Index a frame of result rows """
+        columns = [column for column in changes.columns if column in self.columns()]
+        with self.db:
+            changes[columns].to_sql("results", self.db, if_exists="append", index=False)
+
+    def columns(self):
+        return [row[1] for row in self.db.execute("PRAGMA table_info(results)")]
+
+    def query(self, **filters):
+        """ Indexed result rows matching every `column=value` filter, None values are ignored """
+        filters = {key: value for key, value in filters.items() if value is not None}
+        unknown = set(filters) - set(self.columns())
+        if unknown:
+            raise KeyError(f"Unknown result columns {sorted(unknown)}")
+        where = " AND ".join(f"{key} = ?" for key in filters) or "1"
+        return pd.read_sql_query(f"SELECT * FROM results WHERE {where} ORDER BY rowid", self.db,
+                                 params=list(filters.values()))
+
+    def sweeps(self):
+        return pd.read_sql_query("SELECT * FROM sweeps ORDER BY started", self.db)
+
+    def close(self):
+        self.db.close()
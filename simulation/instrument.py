@@ -0,0 +1,129 @@
+"""
+Stage timers and counters for the sweep pipeline. Disabled by default, in
+which case `stage` hands back a shared no-op context and `count` returns
+straight away. Nested stages are recorded under their '/' joined path.
+Stats merged in from units of work are kept apart from the wall clock tree:
+pooled workers overlap, so their summed time can exceed the stage they ran in.
+"""
+import contextlib
+import json
+
+from collections import defaultdict
+from time import perf_counter as timer
+
+from simulation.elevator.runtime import Config
+
+
+class Recorder:
+    def __init__(self):
+        self.timings = defaultdict(lambda: [0.0, 0])     # path -> [seconds, calls]
+        self.merged = defaultdict(lambda: [0.0, 0])      # path -> [seconds, calls], summed over units of work
+        self.counters = defaultdict(int)
+        self.path = []
+
+    @contextlib.contextmanager
+    def timed(self, name):
+        self.path.append(name)
+        key = '/'.join(self.path)
+        begin = timer()
+        try:
+            yield
+        finally:
+            record = self.timings[key]
+            record[0] += timer() - begin
+            record[1] += 1
+            self.path.pop()
+
+    def export(self):
+        """ Recorded stats as plain data that can cross process boundaries """
+        stages = {key: list(value) for key, value in self.timings.items()}
+        for key, (seconds, calls) in self.merged.items():
+            stages[key] = [stages.get(key, [0.0, 0])[0] + seconds, stages.get(key, [0.0, 0])[1] + calls]
+        return {'stages': stages, 'counters': dict(self.counters)}
+
+    def merge(self, stats):
+        """ Fold stats exported by a unit of work into this recorder's merged stages, under its open stages """
+        prefix = ''.join(f"{name}/" for name in self.path)
+        for key, (seconds, calls) in stats['stages'].items():
+            self.merged[prefix + key][0] += seconds
+            self.merged[prefix + key][1] += calls
+        for name, n in stats['counters'].items():
+            self.counters[name] += n
+
+
+enabled = Config.PROFILE
+current = Recorder()
+idle = contextlib.nullcontext()
+
+
+def enable(on=True):
+    global enabled
+    enabled = on
+
+
+def reset():
+    global current
+    current = Recorder()
+
+
+@contextlib.contextmanager
+def capture():
+    """ Record the enclosed block into a fresh `Recorder`, eg: one unit of work to hand back to the parent """
+    global current
+    outer, current = current, Recorder()
+    try:
+        yield current
+    finally:
+        current = outer
+
+
+def stage(name):
+    """ Time the enclosed block as `name`, nested under the currently open stages """
+    return current.timed(name) if enabled else idle
+
+
+def count(name, n=1):
+    if enabled:
+        current.counters[name] += int(n)
+
+
+def merge(stats):
+    current.merge(stats)
+
+
+def tree(timings):
+    """ Breakdown lines of one stage tree, every stage as a share of its parent or of all the tree's roots """
+    totals = {key: seconds for key, (seconds, _) in timings.items()}
+    roots = sum(seconds for key, seconds in totals.items() if key.rpartition('/')[0] not in totals)
+    lines = []
+    for key in sorted(timings):
+        seconds, calls = timings[key]
+        parent = key.rpartition('/')[0]
+        depth, ancestor = 0, parent
+        while ancestor in totals:
+            depth, ancestor = depth + 1, ancestor.rpartition('/')[0]
+        name = '  ' * depth + key.rpartition('/')[2] if depth else key
+        lines.append(f"{name:<40}{calls:>8}{seconds:>12.4f}{seconds / max(totals.get(parent, roots), 1e-12):>8.1%}")
+    return lines
+
+
+def breakdown():
+    """
+    Per-stage breakdown lines: the wall clock tree of this process, then the
+    stages of its units of work, whose seconds are summed over every worker
+    """
+    lines = [f"{'stage':<40}{'calls':>8}{'seconds':>12}{'share':>8}", *tree(current.timings)]
+    if current.merged:
+        lines.extend(["", f"{'worker stages, summed over workers':<40}{'calls':>8}{'seconds':>12}{'share':>8}",
+                      *tree(current.merged)])
+    lines.extend(f"{name:<40}{n:>8}" for name, n in sorted(current.counters.items()))
+    return "\n".join(lines)
+
+
+def dump(fname):
+    with open(fname, 'w') as fp:
+        json.dump({'stages': {key: {'seconds': seconds, 'calls': calls}
+                              for key, (seconds, calls) in current.timings.items()},
+                   'worker_stages': {key: {'seconds': seconds, 'calls': calls}
+                                     for key, (seconds, calls) in current.merged.items()},
+                   'counters': dict(current.counters)}, fp, indent=2)
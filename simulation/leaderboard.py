@@ -0,0 +1,124 @@
+import argparse
+import numpy as np
+import pandas as pd
+
+
+GROUP = ['category', 'sensor']
+PARAMS = ['detector', 'drift', 'threshold']
+SCORES = ['detection_effectiveness', 'false_alarm_rate']
+
+
+def groups(changes, by):
+    """ Integer id of every row's group of `by` columns, in sorted key order """
+    by = [key for key in by if key in changes]
+    if not by:
+        return np.zeros(len(changes), dtype=np.int64)
+    return changes.groupby(by, dropna=False, sort=True).ngroup().to_numpy()
+
+
+def order(changes, by):
+    """ Rows sorted by group, then best detection first and lowest false alarms among ties, with their group ids """
+    ids = groups(changes, by)
+    idx = np.lexsort((changes['false_alarm_rate'].to_numpy(), -changes['detection_effectiveness'].to_numpy(), ids))
+    return changes.iloc[idx], ids[idx]
+
+
+def best(changes, by=()):
+    """
+    Rows tied for the highest detection effectiveness and, among those, for
+    the lowest false alarm rate, per group of `by` columns
+    """
+    ids = groups(changes, by)
+    detection = changes['detection_effectiveness'].to_numpy()
+    top = detection == pd.Series(detection).groupby(ids).transform('max').to_numpy()
+    rs, ids, far = changes.loc[top], ids[top], changes['false_alarm_rate'].to_numpy()[top]
+    return rs.loc[far == pd.Series(far).groupby(ids).transform('min').to_numpy()]
+
+
+def frontier(changes, by=GROUP):
+    """
+    Non-dominated rows per group of `by` columns: no other row of the group
+    detects at least as well with no more false alarms, better on one of them.
+    Only the lowest rate at each detection level can qualify, so one hashed
+    grouping prunes the rows before the remaining few are sorted and scanned.
+    """
+    if changes.empty:
+        return changes
+    far = changes['false_alarm_rate']
+    keys = [changes[key] for key in by if key in changes] + [changes['detection_effectiveness']]
+    rs, ids = order(changes.loc[far == far.groupby(keys, dropna=False).transform('min')], by)
+
+    detection, far = rs['detection_effectiveness'].to_numpy(), rs['false_alarm_rate'].to_numpy()
+    first = np.diff(ids, prepend=-1) != 0
+    starts = first | (np.diff(detection, prepend=np.nan) != 0)
+    lowest = np.roll(pd.Series(far).groupby(ids).cummin().to_numpy(), 1)
+    lowest[first] = np.inf                      # Lowest rate among the rows sorted above, within the group
+    block = np.maximum.accumulate(np.where(starts, np.arange(len(rs)), 0))
+    return rs.loc[lowest[block] > far]          # ... as of the block start, ie: at strictly better detection
+
+
+def aggregate(changes, by=GROUP + PARAMS, z=1.96):
+    """
+    Mean, spread and `z` confidence interval of both scores per parameter
+    set, across every cycle and sweep of `changes`, in one grouped pass
+    """
+    by = [key for key in by if key in changes]
+    stats = changes.groupby(by, dropna=False)[SCORES].agg(['count', 'mean', 'std'])
+    rs = pd.DataFrame({'runs': stats[(SCORES[0], 'count')]})
+    for score in SCORES:
+        rs[score] = stats[(score, 'mean')]
+        rs[f"{score}_std"] = stats[(score, 'std')].fillna(0)
+        rs[f"{score}_ci"] = z * rs[f"{score}_std"] / np.sqrt(rs['runs'])
+    return rs.reset_index()
+
+
+def leaderboard(changes, by=GROUP):
+    """ Aggregated parameter sets on each group's frontier, best first """
+    rs, ids = order(frontier(aggregate(changes, [*by, *PARAMS]), by), by)
+    return rs.assign(rank=pd.Series(ids).groupby(ids).cumcount().to_numpy() + 1)
+
+
+def check(trials=200, seed=1):
+    """ Assert `frontier` and `best` against brute-force dominance and tie tests on random score tables """
+    rng = np.random.default_rng(seed)
+    for trial in range(trials):
+        n = int(rng.integers(1, 40))
+        changes = pd.DataFrame({'category': rng.choice(['SURGE', 'BIAS'], n),
+                                'sensor': rng.choice(['temp', 'weight'], n),
+                                'detection_effectiveness': rng.choice([0, 50, 100.0], n),
+                                'false_alarm_rate': rng.choice([0, 1.5, 3, 10.0], n)})
+        expected = set()
+        for idx, row in changes.iterrows():
+            rs = changes.loc[(changes.category == row.category) & (changes.sensor == row.sensor)]
+            detection, far = rs['detection_effectiveness'], rs['false_alarm_rate']
+            dominated = (detection >= row.detection_effectiveness) & (far <= row.false_alarm_rate) & \
+                        ((detection > row.detection_effectiveness) | (far < row.false_alarm_rate))
+            if not dominated.any():
+                expected.add(idx)
+        assert set(frontier(changes).index) == expected, trial
+
+        for category, rs in changes.groupby('category'):
+            top = rs.loc[rs['detection_effectiveness'] == rs['detection_effectiveness'].max()]
+            top = top.loc[top['false_alarm_rate'] == top['false_alarm_rate'].min()]
+            assert list(best(rs).index) == list(top.index), (trial, category)
+
+
+if __name__ == "__main__":
+    A = argparse.ArgumentParser()
+    A.add_argument("-a", "--attack", help="target attack category")
+    A.add_argument("-s", "--sensor", help="target system sensor(s), eg: temp,weight")
+    A.add_argument("-d", "--detector", help="only this detector")
+    A.add_argument("--check", help="verify the frontier against a brute-force search and exit", action="store_true")
+    args = A.parse_args()
+
+    if args.check:
+        check()
+        print("frontier ok")
+        raise SystemExit
+
+    from simulation.log import ChangeWriter
+
+    changes = ChangeWriter.past(category=args.attack, sensor=args.sensor, detector=args.detector).changes
+    board = leaderboard(changes)
+    with pd.option_context('display.max_rows', None, 'display.max_columns', None, 'display.width', 200):
+        print(board)
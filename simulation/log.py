@@ -1,32 +1,60 @@
 
 import pandas as pd
 
-from os import path
-from tqdm import tqdm
+from os import makedirs, path
 
-from simulation import plots
+from simulation import instrument, leaderboard, plots
+from simulation.history import History
 from simulation.elevator import runtime
 from simulation.elevator.runtime import Config
 
 
+COLUMNS = [
+    'sweep',
+    'cycle',
+    'category',
+    'sensor',
+    'detector',
+    'drift',
+    'threshold',
+    'samples',
+    'attacks',
+    'alarms',
+    'detected',
+    'false_alarms',
+    'detection_effectiveness',
+    'false_alarm_rate',
+    'trace',
+    'entry'
+]
+
+
 class ChangeWriter:
-    def __init__(self, changesets):
+    def __init__(self, changesets, root=None):
+        self.root = root
         self.changes = self.process(changesets)
-        self.changes = self.changes[[
-            'cycle',
-            'category',
-            'drift',
-            'threshold',
-            'samples',
-            'attacks',
-            'attack_points',
-            'change_points',
-            'detected',
-            'false_alarms',
-            'detection_effectiveness',
-            'false_alarm_rate',
-            'readings'
-        ]]
+        self.changes = self.changes.reindex(columns=COLUMNS)
+
+    @classmethod
+    def wrap(cls, changes, root=None):
+        """ Writer over a frame of rows that were already processed """
+        writer = cls.__new__(cls)
+        writer.root = root
+        writer.changes = changes.reindex(columns=COLUMNS)
+        return writer
+
+    @classmethod
+    def load(cls, fname):
+        """ Writer over rows already persisted to `fname`, eg: by a `ResultSink` """
+        return cls.wrap(pd.read_csv(fname), path.dirname(fname))
+
+    @classmethod
+    def past(cls, **filters):
+        """ Writer over the indexed rows of every past sweep, eg: `past(category='SURGE', sensor='temp')` """
+        history = History()
+        writer = cls.wrap(history.query(**filters))
+        history.close()
+        return writer
 
     def get(self, category, best=False):
         if len(category.split(',')) == 1:
@@ -35,25 +63,30 @@ class ChangeWriter:
 
         rs = self.changes.loc[self.changes.category == category]
         if best:
-            rs = rs.loc[rs['detection_effectiveness'] == rs['detection_effectiveness'].max()]
-            rs = rs.loc[rs['false_alarm_rate'] == rs['false_alarm_rate'].min()]
+            rs = leaderboard.best(rs)
 
         return rs.loc[rs['detection_effectiveness'] > Config.MIN_DETECTION_EFFECTIVENESS]\
                  .loc[rs['false_alarm_rate'] < Config.MAX_FALSE_ALARM_RATE]\
                  .sort_values(by='detection_effectiveness', ascending=False)
 
     def log(self):
-        runs = runtime.setup()
-        fname = path.join(runs, "results.csv")
+        self.root = self.root or runtime.setup()
+        fname = path.join(self.root, "results.csv")
         mode = "a" if (path.exists(fname) and path.getsize(fname) != 0) else "w"
-        self.changes.to_csv(fname, mode=mode, index=False, header=not path.exists(fname))
+        with instrument.stage("write"):
+            self.changes.to_csv(fname, mode=mode, index=False, header=not path.exists(fname))
+        return self.plot()
+
+    def plot(self):
+        if (Config.SHOW_PLOTS or Config.SAVE_PLOTS) and not self.changes.empty:
+            frames = pick(self.changes)
+            with instrument.stage("plot"):
+                return plots.draw(frames.squeeze(axis=0))
 
-        if Config.SHOW_PLOTS or Config.SAVE_PLOTS:
-            frames = self.changes.loc[self.changes['detection_effectiveness'] ==
-                                      self.changes['detection_effectiveness'].max()]
-            frames = frames.loc[frames['false_alarm_rate'] == frames['false_alarm_rate'].min()]\
-                            .sort_values(by='attacks', ascending=False).iloc[:1]
-            return plots.draw(frames.squeeze(axis=0))
+    def render(self, dst=None, workers=Config.WORKERS, points=Config.PLOT_POINTS):
+        """ Save a figure of every row under `dst`, `<sweep>/plots` by default, see `plots.render` """
+        with instrument.stage("render"):
+            return plots.render(self.changes, dst or path.join(self.root, "plots"), workers, points)
 
     def process(self, summary):
         for idx, record in enumerate(summary):
@@ -81,3 +114,63 @@ class ChangeWriter:
                 pass
 
         return pd.DataFrame(summary)
+
+
+def pick(changes):
+    """ The row `plot` draws: the best detection, then fewest false alarms, then most attacks, earliest first """
+    return leaderboard.best(changes).sort_values(by='attacks', ascending=False, kind='stable').iloc[:1]
+
+
+class ResultSink:
+    """
+    Appends summary rows to the `results.csv` of sweep directory `root` as
+    they arrive, `size` rows at a time, so memory stays flat over a sweep and
+    a crash only loses the pending batch. Flushed rows are also indexed in
+    `history` when given, and the row `pick` would choose among every row so
+    far is kept, so the sweep can be plotted without reading it back. Read
+    them back with `ChangeWriter.load`.
+    """
+    def __init__(self, root, history=None, size=Config.RESULTS_BATCH):
+        self.root, self.fname = root, path.join(root, "results.csv")
+        self.history, self.size = history, size
+        self.pending, self.rows, self.best = [], 0, None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+
+    def append(self, rows):
+        self.pending.extend(rows)
+        while len(self.pending) >= self.size:
+            self.flush(self.size)
+
+    def flush(self, count=None):
+        """ Write the first `count` pending rows, all of them by default """
+        count = len(self.pending) if count is None else count
+        batch, self.pending = self.pending[:count], self.pending[count:]
+        if not batch:
+            return
+        with instrument.stage("write"):
+            makedirs(path.dirname(self.fname), exist_ok=True)
+            header = not path.exists(self.fname) or path.getsize(self.fname) == 0
+            changes = ChangeWriter(batch).changes
+            changes.to_csv(self.fname, mode="a", index=False, header=header)
+            if self.history is not None:
+                self.history.add(changes)
+            # The pick is a lexicographic max with earliest ties, so the running one stays exact across batches
+            self.best = pick(changes if self.best is None else pd.concat([self.best, changes]))
+        self.rows += len(batch)
+
+    def plot(self):
+        """ Plot the best row of the sweep like `ChangeWriter.plot`, None when nothing was flushed """
+        return ChangeWriter.wrap(self.best, self.root).plot() if self.best is not None else None
+
+    def render(self, dst=None, workers=Config.WORKERS, points=Config.PLOT_POINTS):
+        """ Save a figure of every flushed row, see `plots.render`, reading them back `size` rows at a time """
+        if not path.exists(self.fname):
+            return 0
+        with instrument.stage("render"):
+            return sum(plots.render(rows.reindex(columns=COLUMNS), dst or path.join(self.root, "plots"), workers, points)
+                       for rows in pd.read_csv(self.fname, chunksize=self.size))
@@ -1,78 +1,162 @@
 
+import math
 import os
-import matplotlib.pyplot as plt
+import numpy as np
 
+from concurrent.futures import ProcessPoolExecutor
 from tqdm import tqdm
 
 from simulation.elevator.runtime import Config
-
-
-def draw(frame, dst=None):
-    temps  = [status['temp'] for status in frame.readings]
-    weights = [status['weight'] for status in frame.readings]
-    maxTemp = [status['MAX_TEMP'] for status in frame.readings]
-    maxWeight = [status['MAX_WEIGHT'] for status in frame.readings]
+from simulation.elevator.store import TraceStore
+
+
+def lttb(values, points):
+    """
+    Largest-Triangle-Three-Buckets: indices of `points` samples of `values`
+    that keep its visual shape, first and last sample included. Each bucket
+    keeps the sample spanning the largest triangle with the previous pick and
+    the next bucket's average, so spikes and edges survive the reduction.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if points >= len(values) or points < 3:
+        return np.arange(len(values))
+
+    edges = np.append(np.linspace(1, len(values) - 1, points - 1).astype(np.int64), len(values))
+    picks = np.zeros(points, dtype=np.int64)
+    picks[-1] = len(values) - 1
+    for bucket in range(points - 2):
+        lo, hi, end = edges[bucket], edges[bucket + 1], edges[bucket + 2]
+        cx, cy = (hi + end - 1) / 2, values[hi:end].mean()
+        ax, ay = picks[bucket], values[picks[bucket]]
+        area = np.abs((ax - cx) * (values[lo:hi] - ay) - (ax - np.arange(lo, hi)) * (cy - ay))
+        picks[bucket + 1] = lo + np.argmax(area)
+    return picks
+
+
+def series(values, points=None):
+    """ `(x, y)` of a trace column, downsampled with `lttb` to `points` samples if given """
+    values = np.asarray(values)
+    idx = lttb(values, points) if points else np.arange(len(values))
+    return idx, values[idx]
+
+
+def name(frame):
+    """ Deterministic file name of the figure of result row `frame` """
+    parts = [frame.get('sweep'), frame.category, frame.get('sensor'), frame.get('detector'),
+             frame.get('drift'), frame.get('threshold'), f"run{frame.cycle}"]
+    return "-".join(str(part) for part in parts if part is not None and part == part) + ".png"
+
+
+def draw(frame, dst=None, store=None, points=None, batch=False, show=None, save=None):
+    """
+    Plot the stored trace and alarms of the result row `frame`, loaded from
+    `store` or else its sweep's store, each line downsampled to `points` samples if given.
+    `batch` trades `tight_layout` and PNG compression for rendering speed.
+    `show` and `save` default to `Config.SHOW_PLOTS` and `Config.SAVE_PLOTS`;
+    a figure that is not shown is built without pyplot, so drawing it never
+    touches the session's backend or figure manager.
+    """
+    show = Config.SHOW_PLOTS if show is None else show
+    save = Config.SAVE_PLOTS if save is None else save
+
+    store = store or TraceStore.of(frame.sweep)
+    trace = store.load(frame.trace)
+    spikes = store.alarms(frame.trace, int(frame.entry))
+    temps, weights = series(trace['temp'], points), series(trace['weight'], points)
+    maxTemp, maxWeight = series(trace['MAX_TEMP'], points), series(trace['MAX_WEIGHT'], points)
 
     boldAlpha = False
-    fig, axs = plt.subplots(2, figsize=(12, 12))
+    if show:
+        import matplotlib.pyplot as plt
+        fig, axs = plt.subplots(2, figsize=(12, 12))
+    else:
+        from matplotlib.figure import Figure
+        fig = Figure(figsize=(12, 12))
+        axs = fig.subplots(2)
     axs[0].set_title(f"Raw sensor measurements (Attack type: {frame.category})")
 
     if frame.category == "BUTTON_ATTACK":
-        axs[0].plot([1 if status['currentLevel'] == 1 else 0 for status in frame.readings],
+        axs[0].plot(*series((trace['currentLevel'] == 1).astype(int), points),
                     linestyle="-", linewidth=1, label="CurrentLevel1")
-        axs[0].plot([status['ButtonLevel1'] for status in frame.readings],
-                    linestyle="-", linewidth=0.8, label="ButtonLevel1")
-        axs[0].plot([status['ButtonLevel2'] for status in frame.readings],
-                    linestyle="-", linewidth=0.8, label="ButtonLevel2")
+        axs[0].plot(*series(trace['ButtonLevel1'], points), linestyle="-", linewidth=0.8, label="ButtonLevel1")
+        axs[0].plot(*series(trace['ButtonLevel2'], points), linestyle="-", linewidth=0.8, label="ButtonLevel2")
 
     elif frame.category == "ATTACK_MAX_TEMP":
-        axs[0].plot(maxTemp, linestyle="-", linewidth=5, label="MAX_TEMP")
-        axs[0].plot(temps, linestyle="-", linewidth=0.8, label="Temperature")
+        axs[0].plot(*maxTemp, linestyle="-", linewidth=5, label="MAX_TEMP")
+        axs[0].plot(*temps, linestyle="-", linewidth=0.8, label="Temperature")
 
     elif frame.category == "ATTACK_MAX_WEIGHT":
         axs[0].set_title(f"Elevator Load (Attack type: {frame.category})")
-        axs[0].plot(maxWeight, linestyle="-", linewidth=5, label="MAX_WEIGHT")
-        axs[0].plot(weights, linestyle="-", linewidth=0.8, label="Elevator load")
+        axs[0].plot(*maxWeight, linestyle="-", linewidth=5, label="MAX_WEIGHT")
+        axs[0].plot(*weights, linestyle="-", linewidth=0.8, label="Elevator load")
 
     else:   # BIAS, SURGE, RANDOM, etc...
         boldAlpha = True
-        axs[0].plot(maxTemp, linestyle="-", linewidth=5, label="MAX_TEMP")
-        axs[0].plot(temps, linestyle="-", linewidth=0.8, label="Temperature")
+        axs[0].plot(*maxTemp, linestyle="-", linewidth=5, label="MAX_TEMP")
+        axs[0].plot(*temps, linestyle="-", linewidth=0.8, label="Temperature")
 
-    try:
-        d = plt.axvspan(min(frame.change_points), max(frame.change_points),
-                        alpha=1.0 if boldAlpha else 0.25, color='yellow', label=f'Detect')
-        plt.annotate(
+    if len(spikes):
+        d = axs[1].axvspan(spikes.min(), spikes.max(),
+                           alpha=1.0 if boldAlpha else 0.25, color='yellow', label=f'Detect')
+        axs[1].annotate(
             xy=d.get_center(),
             text=f'''
             Detection Effectiveness = {frame.detection_effectiveness}%
             False Alarm Rate = {frame.false_alarm_rate}%
             '''
         )
-    except Exception as err:
-        tqdm.write("No attack/detect ranges to highlight" + err.args[0])
-        raise err
+    else:
+        tqdm.write(f"No detect range to highlight for {name(frame)}")
 
-    for idx, attacks in enumerate(frame.attack_points):
+    for idx, (start, end) in enumerate((trace.attack_windows - trace.offset).tolist()):
         if idx > 0:
-            plt.axvspan(min(attacks), max(attacks), alpha=0.1, color='red')
+            axs[1].axvspan(start, end, alpha=0.1, color='red')
         else:
-            plt.axvspan(min(attacks), max(attacks), alpha=0.1, color='red', label=f'Attack')
+            axs[1].axvspan(start, end, alpha=0.1, color='red', label=f'Attack')
     axs[0].legend()
 
-    axs[1].plot([status["moving"] for status in frame.readings], linestyle="-", linewidth=0.8, label="Moving")
-    axs[1].plot([status["fire_alarm"] for status in frame.readings], linestyle="-", linewidth=5, label="Fire Alarm")
-    axs[1].plot([status["overweight_alarm"] for status in frame.readings], linestyle="-", linewidth=5, label="Load Alarm")
+    axs[1].plot(*series(trace["moving"], points), linestyle="-", linewidth=0.8, label="Moving")
+    axs[1].plot(*series(trace["fire_alarm"], points), linestyle="-", linewidth=5, label="Fire Alarm")
+    axs[1].plot(*series(trace["overweight_alarm"], points), linestyle="-", linewidth=5, label="Load Alarm")
     axs[1].set_title("Fire alarm, Load alarm, Elevator motion")
     axs[1].legend()
 
-    plt.tight_layout()
-    if Config.SHOW_PLOTS:
+    if batch:
+        fig.subplots_adjust(left=0.05, right=0.98, bottom=0.04, top=0.97, hspace=0.12)
+    else:
+        fig.tight_layout()
+    if show:
         plt.show(block=True)
 
-    if dst and Config.SAVE_PLOTS:
-        num = len([f for f in os.listdir(dst) if os.path.isfile(os.path.join(dst, f))]) + 1
-        fig.savefig(f"{dst}/{num}.png")
-        plt.close()
+    if dst and save:
+        fig.savefig(os.path.join(dst, name(frame)), pil_kwargs={'compress_level': 1} if batch else None)
 
     return frame
+
+
+def save(rows, dst, points):
+    """ Worker side of `render`: draw and save every row off-screen, leaving `Config` and the backend alone """
+    import pandas as pd
+
+    stores = {}
+    for row in rows:
+        frame = pd.Series(row)
+        store = stores.setdefault(frame.sweep, TraceStore.of(frame.sweep))
+        draw(frame, dst, store, points, batch=True, show=False, save=True)
+    return len(rows)
+
+
+def render(frames, dst, workers=Config.WORKERS, points=Config.PLOT_POINTS):
+    """
+    Save a figure of every row of `frames` under `dst`, named by `name`,
+    headless and spread over `workers` processes. Lines are downsampled to
+    `points` samples, which bounds the cost of a figure for long traces.
+    """
+    os.makedirs(dst, exist_ok=True)
+    rows = frames.to_dict('records')
+    chunk = max(1, math.ceil(len(rows) / (max(1, workers) * 4)))
+    chunks = [rows[start:start + chunk] for start in range(0, len(rows), chunk)]
+    if workers > 1:
+        with ProcessPoolExecutor(workers) as pool:
+            return sum(pool.map(save, chunks, [dst] * len(chunks), [points] * len(chunks)))
+    return sum(save(rows, dst, points) for rows in chunks)
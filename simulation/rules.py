@@ -0,0 +1,93 @@
+import numpy as np
+
+from dataclasses import dataclass
+from typing import Callable
+
+from simulation import instrument
+
+
+@dataclass(frozen=True)
+class Rule:
+    """ An invariant over reading columns, `holds` returns where it is satisfied """
+    name: str
+    message: str
+    holds: Callable
+    enabled: bool = True
+
+
+RULES = [
+    Rule("weight", "Weight exceeds threshold",
+         lambda r: np.less(r['weight'], r['MAX_WEIGHT'])),
+    Rule("temp", "Temperature exceeds threshold",
+         lambda r: np.less(r['temp'], r['MAX_TEMP'])),
+    Rule("fire_alarm", "Fire alarm raised when temprature is within thresholds",
+         lambda r: np.logical_or(np.logical_not(r['fire_alarm']), np.greater(r['temp'], r['MAX_TEMP']))),
+    Rule("overweight_alarm", "Weight alarm raised when wieght is within thresholds",
+         lambda r: np.logical_or(np.logical_not(r['overweight_alarm']), np.greater(r['weight'], r['MAX_WEIGHT']))),
+
+    # TODO: Decide if you can move to level 1 when already at level 1?
+    Rule("level", "Cannot move to level 1, already at level 1",
+         lambda r: np.logical_not(np.logical_and(np.equal(r['currentLevel'], 1), r['movingToLevel1'])),
+         enabled=False),
+    Rule("door", "Door open when elevator is moving",
+         lambda r: np.logical_not(np.logical_and(r['moving'], r['doorOpen'])),
+         enabled=False),
+]
+
+
+class RuleEngine:
+    """
+    Evaluates every enabled rule over a whole trace at once. Accepts anything
+    indexable by column name: a `Trace`, a dict of arrays or a single reading.
+    """
+    def __init__(self, rules=RULES, enable=(), disable=()):
+        self.rules = [r for r in rules if (r.enabled or r.name in enable) and r.name not in disable]
+
+    def violations(self, columns):
+        """ Per-rule masks of the cycles breaking that rule """
+        return {rule.name: np.logical_not(rule.holds(columns)) for rule in self.rules}
+
+    def holds(self, columns):
+        """ Mask of the cycles satisfying every rule """
+        masks = [rule.holds(columns) for rule in self.rules]
+        return np.logical_and.reduce(masks) if masks else np.ones(np.shape(columns['temp']), dtype=bool)
+
+    def broken(self, columns):
+        """ Mask of the cycles breaking any rule, each rule's breaks counted as `rule/<name>` when instrumented """
+        violations = self.violations(columns)
+        if instrument.enabled:
+            for name, mask in violations.items():
+                instrument.count(f"rule/{name}", np.count_nonzero(mask))
+        if not violations:
+            return np.zeros(np.shape(columns['temp']), dtype=bool)
+        return np.logical_or.reduce(list(violations.values()))
+
+    def counts(self, columns):
+        """ Number of cycles breaking each rule """
+        return {name: int(np.count_nonzero(mask)) for name, mask in self.violations(columns).items()}
+
+
+def columns(readings, keys=('weight', 'MAX_WEIGHT', 'temp', 'MAX_TEMP', 'fire_alarm', 'overweight_alarm',
+                            'currentLevel', 'movingToLevel1', 'moving', 'doorOpen')):
+    """ Column view of `readings`, zero-copy for traces and one pass for legacy dict lists """
+    trace = getattr(readings, 'trace', readings)
+    if hasattr(trace, 'columns'):
+        return trace.columns
+    return {key: np.array([r.get(key) for r in readings]) for key in keys}
+
+
+engine = RuleEngine()
+
+
+if __name__ == '__main__':
+    # Every enabled rule's breaks must reach the instrument counters, and only those cycles are broken
+    readings = {'weight': np.array([100, 1300, 1300]), 'MAX_WEIGHT': np.full(3, 1200),
+                'temp': np.array([50, 50, 120]), 'MAX_TEMP': np.full(3, 100),
+                'fire_alarm': np.array([0, 0, 1]), 'overweight_alarm': np.array([1, 0, 0])}
+    instrument.enable()
+    with instrument.capture() as stats:
+        broken = engine.broken(readings)
+    assert broken.tolist() == [True, True, True]
+    assert dict(stats.counters) == {'rule/weight': 2, 'rule/temp': 1, 'rule/fire_alarm': 0,
+                                    'rule/overweight_alarm': 1}, stats.counters
+    assert np.array_equal(broken, ~engine.holds(readings))
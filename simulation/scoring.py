@@ -0,0 +1,73 @@
+import numpy as np
+
+
+def score(traces, spikes, lanes=None):
+    """
+    Score many sets of change points against ground-truth attack windows in
+    one call. `spikes[i]` are change points on `traces[lanes[i]]`; every
+    trace is laid out on one global timeline so a single `searchsorted`
+    matches all change points to their windows. Returns per-entry arrays
+    with the same semantics as `detect.analyze`.
+    """
+    lanes = np.arange(len(spikes)) if lanes is None else np.asarray(lanes, dtype=np.int64)
+    lengths = np.array([len(trace) for trace in traces], dtype=np.int64)
+    base = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+
+    counts = np.concatenate([trace['count'] for trace in traces]).astype(np.int64)
+    durations = np.array([np.count_nonzero(trace['launched']) for trace in traces], dtype=np.int64)
+    windows = [trace.attack_windows - trace.offset for trace in traces]
+    starts = np.concatenate([w[:, 0] + b for w, b in zip(windows, base)])
+    ends = np.concatenate([w[:, 1] + b for w, b in zip(windows, base)])
+    kinds = np.array([len([a for a in (trace.category or '').split(',') if a]) for trace in traces], dtype=np.int64)
+
+    sizes = np.array([len(s) for s in spikes], dtype=np.int64)
+    entry = np.repeat(np.arange(len(spikes)), sizes)
+    points = np.concatenate([np.asarray(s, dtype=np.int64) for s in spikes] or [np.zeros(0, dtype=np.int64)])
+    points = points + base[lanes][entry]
+
+    inside = np.zeros(len(points), dtype=bool)
+    if len(starts):
+        idx = np.searchsorted(starts, points, side='right') - 1
+        inside = (idx >= 0) & (points <= ends[np.maximum(idx, 0)])
+    weights = counts[points]
+    hits = np.bincount(entry, weights * inside, len(spikes)).astype(np.int64)
+    misses = np.bincount(entry, weights * ~inside, len(spikes)).astype(np.int64)
+
+    attacks = np.array([len(w) for w in windows], dtype=np.int64)[lanes] * kinds[lanes]
+    detected = np.minimum(hits, attacks)
+    false_alarms = np.where(hits <= attacks, misses, misses + np.abs(hits - attacks))
+    return {
+        'hits': hits,
+        'misses': misses,
+        'samples': lengths[lanes],
+        'attacks': attacks,
+        'detected': detected,
+        'false_alarms': false_alarms,
+        'detection_effectiveness': (detected / np.maximum(1, attacks)) * 100.0,
+        'false_alarm_rate': (false_alarms / np.maximum(1, lengths[lanes] - durations[lanes])) * 100.0,
+    }
+
+
+def records(traces, entries):
+    """
+    Summary rows for `(lane, spikes, extra)` entries, shaped like `detect.analyze`
+    output and updated with `extra`. Rows hold the number of alarms only, the
+    alarm indices themselves are kept next to the traces in the `TraceStore`.
+    """
+    lanes = [lane for lane, _, _ in entries]
+    scores = score(traces, [spikes for _, spikes, _ in entries], lanes)
+
+    rows = []
+    for idx, (lane, spikes, extra) in enumerate(entries):
+        rows.append({
+            'category': traces[lane].category,
+            'samples': int(scores['samples'][idx]),
+            'attacks': int(scores['attacks'][idx]),
+            'alarms': len(spikes),
+            'detected': int(scores['detected'][idx]),
+            'false_alarms': int(scores['false_alarms'][idx]),
+            'detection_effectiveness': round(float(scores['detection_effectiveness'][idx]), 2),
+            'false_alarm_rate': round(float(scores['false_alarm_rate'][idx]), 2),
+            **extra
+        })
+    return rows